@@ -1,28 +1,55 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-import os
 
-db = SQLAlchemy()
+from .database import RoutingSession, configure as configure_database, default_uri, install_pragmas
 
-def create_app():
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def create_app(config=None):
     app = Flask(
         __name__,
         static_url_path='/static',
         static_folder='../static'
     )
 
-    # Use absolute path to the database
-    base_dir = os.path.abspath(os.path.dirname(__file__))
-    db_path = os.path.join(base_dir, '..', 'database', 'edulink.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    # database/edulink.db unless DATABASE_URL points elsewhere (see database.py)
+    app.config['SQLALCHEMY_DATABASE_URI'] = default_uri()
 
     app.config['SECRET_KEY'] = 'supersecretkey'
 
+    # Overrides for scripts and checks (e.g. a scratch database)
+    if config:
+        app.config.update(config)
+
+    configure_database(app)
     db.init_app(app)
 
+    from .migrations import upgrade_schema
+    with app.app_context():
+        install_pragmas(app, db.engines)
+        upgrade_schema(db)
+        # Don't hand connections opened at startup to forked workers
+        for engine in db.engines.values():
+            engine.dispose()
+
+    from .utils.embedding_queue import embedding_queue
+    embedding_queue.init_app(app)
+
+    from .utils.recommendation_cache import recommendation_cache
+    recommendation_cache.init_app(app)
+
+    from .utils.progress_buffer import progress_buffer
+    progress_buffer.init_app(app)
+
+    from .utils.request_metrics import request_metrics
+    request_metrics.init_app(app)
+
     from .routes import auth, student, volunteer
     app.register_blueprint(auth.bp)
     app.register_blueprint(student.student_bp)
     app.register_blueprint(volunteer.bp)
 
+    from .commands import register_commands
+    register_commands(app)
+
     return app
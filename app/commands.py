@@ -0,0 +1,231 @@
+import json
+import time
+from collections import defaultdict
+
+import click
+
+from app import db
+from app.models import User, Progress
+
+
+@click.command('recommend-digest')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), required=True,
+              help='JSONL file to write, one {"student_id", "course_ids"} object per line.')
+@click.option('--top-n', default=5, show_default=True)
+@click.option('--chunk-size', default=1024, show_default=True,
+              help='Students scored per matrix product.')
+@click.option('--processes', default=1, show_default=True,
+              help='Worker processes to spread chunks over.')
+def recommend_digest(output, top_n, chunk_size, processes):
+    """Write the top courses for every student (nightly digest)."""
+    from app.utils.recommendation import recommend_courses_batch
+
+    start = time.perf_counter()
+    completed = defaultdict(list)
+    rows = (
+        db.session.query(Progress.student_id, Progress.course_id)
+        .filter(Progress.percent_complete >= 100)
+    )
+    for student_id, course_id in rows:
+        completed[student_id].append(course_id)
+
+    student_ids = db.session.query(User.id).filter_by(role='student').order_by(User.id)
+    profiles = ((student_id, completed.get(student_id, [])) for (student_id,) in student_ids)
+
+    count = 0
+    with open(output, 'w') as f:
+        for student_id, course_ids in recommend_courses_batch(
+            profiles, top_n=top_n, chunk_size=chunk_size, processes=processes
+        ):
+            f.write(json.dumps({'student_id': student_id, 'course_ids': course_ids}) + '\n')
+            count += 1
+
+    click.echo(f"Wrote recommendations for {count} students to {output} "
+               f"in {time.perf_counter() - start:.1f}s")
+
+
+@click.group('course-stats')
+def course_stats_cli():
+    """Check or rebuild the materialized CourseStats counters."""
+
+
+@course_stats_cli.command('verify')
+def course_stats_verify():
+    """Report courses whose stored counters drifted from the source tables."""
+    from app.utils import course_stats
+
+    drift = course_stats.verify()
+    for course_id, stored, expected in drift:
+        click.echo(f"course {course_id}: stored={stored} expected={expected}")
+    if drift:
+        raise click.ClickException(f"{len(drift)} courses drifted; run 'flask course-stats rebuild'")
+    click.echo("Course stats are consistent.")
+
+
+@course_stats_cli.command('rebuild')
+def course_stats_rebuild():
+    """Recompute every course's counters from the source tables."""
+    from app.utils import course_stats
+
+    count = course_stats.rebuild()
+    click.echo(f"Rebuilt stats for {count} courses.")
+
+
+@click.command('recompute-progress')
+@click.option('--course-id', type=int, default=None, help='Only this course.')
+def recompute_progress(course_id):
+    """Rebuild completed-item counters and percentages from the progress tables."""
+    from app.utils import course_stats, progress
+
+    updated = progress.recompute(course_id=course_id)
+    # Percentages may have moved across 100%, so refresh completion counts too
+    course_stats.rebuild()
+    click.echo(f"Repaired {updated} progress rows.")
+
+
+@click.command('convert-embeddings')
+@click.option('--dtype', type=click.Choice(['float32', 'float16', 'int8']), required=True,
+              help='New row encoding (set RECOMMENDER_DTYPE to match).')
+def convert_embeddings(dtype):
+    """Re-encode the shared course embedding store (workers pick it up on reload)."""
+    from app.utils import recommendation
+
+    store = recommendation.get_store()
+    manifest = store.manifest()
+    if manifest is None:
+        raise click.ClickException(f"No embedding store at {store.path}")
+    current = manifest.get('dtype', 'float32')
+    if current == dtype:
+        click.echo(f"Embedding store is already {dtype}.")
+        return
+    start = time.perf_counter()
+    store.compact(dtype=dtype)
+    store.dtype = dtype
+    click.echo(f"Converted embedding store from {current} to {dtype} "
+               f"in {time.perf_counter() - start:.1f}s")
+
+
+@click.command('embed-pending')
+@click.option('--batch-size', type=int, default=None,
+              help='Courses per encode call (default: EMBEDDING_BATCH_SIZE).')
+def embed_pending(batch_size):
+    """Embed courses still waiting for an embedding (e.g. after import-catalog --no-embed)."""
+    from app.models import Course
+    from app.utils.embedding_queue import embedding_queue
+
+    start = time.perf_counter()
+    count = embedding_queue.embed_pending(
+        batch_size, on_batch=lambda total: click.echo(f"  {total} embedded")
+    )
+    click.echo(f"Embedded {count} courses in {time.perf_counter() - start:.1f}s.")
+    left = Course.query.filter_by(embedding_pending=True).count()
+    if left:
+        raise click.ClickException(f"{left} courses are still pending; see the log for encode errors")
+
+
+@click.command('export-encoder')
+@click.option('--output', '-o', type=click.Path(file_okay=False), default=None,
+              help='Export directory (default: EMBEDDING_ONNX_PATH).')
+@click.option('--no-quantize', is_flag=True, help='Keep float32 weights.')
+def export_encoder(output, no_quantize):
+    """Export the sentence encoder to ONNX for EMBEDDING_BACKEND=onnx."""
+    from app.utils import embedding_service
+    from app.utils.onnx_encoder import export
+
+    output = output or embedding_service.ONNX_PATH
+    start = time.perf_counter()
+    export(embedding_service.MODEL_NAME, output, quantize=not no_quantize)
+    click.echo(f"Exported {embedding_service.MODEL_NAME} to {output} "
+               f"in {time.perf_counter() - start:.1f}s")
+
+
+@click.command('import-catalog')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lessons', type=click.Path(exists=True, dir_okay=False),
+              help='CSV of lessons (course_key,title,content) for a CSV course file.')
+@click.option('--videos', type=click.Path(exists=True, dir_okay=False),
+              help='CSV of videos (course_key,title,url) for a CSV course file.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Courses per transaction.')
+@click.option('--volunteer-id', type=int, default=None,
+              help='Owner of records that have no volunteer_id.')
+@click.option('--encode-workers', default=1, show_default=True,
+              help='Threads encoding embeddings while the next chunk is inserted.')
+@click.option('--no-embed', is_flag=True,
+              help='Skip encoding; courses stay pending for `flask embed-pending`.')
+def import_catalog(path, lessons, videos, chunk_size, volunteer_id, encode_workers, no_embed):
+    """Bulk-load courses (JSONL or CSV) with their lessons, videos and embeddings."""
+    from app.models import Lesson, Video
+    from app.utils import catalog_import
+
+    start = time.perf_counter()
+    if path.endswith('.csv'):
+        records = catalog_import.read_csv(path)
+    else:
+        records = catalog_import.read_jsonl(path)
+
+    def report(counts):
+        click.echo(f"  {counts['courses']} courses, {counts['lessons']} lessons, "
+                   f"{counts['videos']} videos, {counts['embedded']} embedded "
+                   f"({catalog_import.rate(counts['courses'], start):.0f} courses/s)")
+
+    try:
+        counts, keys = catalog_import.import_catalog(
+            records, chunk_size=chunk_size, volunteer_id=volunteer_id,
+            embed=not no_embed, encode_workers=encode_workers, on_chunk=report
+        )
+        for model, items_path in ((Lesson, lessons), (Video, videos)):
+            if items_path:
+                name = model.__tablename__ + 's'
+                counts[name] += catalog_import.import_items(
+                    model, catalog_import.read_csv(items_path), keys, chunk_size=chunk_size * 4,
+                    on_chunk=lambda total: click.echo(f"  {total} {name}")
+                )
+    except ValueError as e:
+        raise click.ClickException(f"{e} (chunks before this one were committed)")
+
+    elapsed = time.perf_counter() - start
+    rows = counts['courses'] + counts['lessons'] + counts['videos']
+    click.echo(f"Imported {counts['courses']} courses, {counts['lessons']} lessons and "
+               f"{counts['videos']} videos in {elapsed:.1f}s "
+               f"({catalog_import.rate(rows, start):.0f} rows/s); {counts['embedded']} courses embedded.")
+    if counts['pending']:
+        click.echo(f"{counts['pending']} courses left pending; run `flask embed-pending` to embed them.")
+
+
+@click.command('profile-startup')
+@click.option('--top', default=25, show_default=True, help='Modules to list.')
+@click.option('--sort', 'sort_by', type=click.Choice(['cumulative', 'self']), default='cumulative',
+              show_default=True)
+@click.option('--raw', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Also write the -X importtime rows as TSV for other tools.')
+def profile_startup(top, sort_by, raw):
+    """Show which imports create_app() spends its time on (python -X importtime)."""
+    from app.utils.startup_profile import HEAVY_MODULES, profile_imports
+
+    wall, rows = profile_imports()
+    column = 1 if sort_by == 'cumulative' else 0
+    click.echo(f"create_app() in a fresh interpreter: {wall:.2f}s wall, "
+               f"{sum(row[0] for row in rows) / 1e6:.2f}s importing {len(rows)} modules")
+    click.echo(f"{'self ms':>9} {'cumul. ms':>10}  module")
+    for self_us, cumulative_us, module, depth in sorted(rows, key=lambda row: row[column], reverse=True)[:top]:
+        click.echo(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>10.1f}  {module}")
+
+    heavy = sorted({module for _, _, module, _ in rows if module.split('.')[0] in HEAVY_MODULES})
+    if heavy:
+        click.echo(f"Heavy modules imported at startup: {', '.join(heavy)}")
+    if raw:
+        with open(raw, 'w') as f:
+            f.write('self_us\tcumulative_us\tdepth\tmodule\n')
+            for self_us, cumulative_us, module, depth in rows:
+                f.write(f'{self_us}\t{cumulative_us}\t{depth}\t{module}\n')
+
+
+def register_commands(app):
+    app.cli.add_command(recommend_digest)
+    app.cli.add_command(course_stats_cli)
+    app.cli.add_command(recompute_progress)
+    app.cli.add_command(convert_embeddings)
+    app.cli.add_command(embed_pending)
+    app.cli.add_command(export_encoder)
+    app.cli.add_command(import_catalog)
+    app.cli.add_command(profile_startup)
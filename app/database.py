@@ -0,0 +1,132 @@
+import os
+
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Database settings, all overridable through create_app(config) or the
+# environment:
+#   SQLALCHEMY_DATABASE_URI   primary database (env DATABASE_URL); defaults
+#                             to database/edulink.db
+#   SQLALCHEMY_READ_URI       database GET requests read from (env
+#                             DATABASE_READ_URL): a replica on other engines.
+#                             For a SQLite file it defaults to a second,
+#                             query-only connection pool on the same file
+#   DATABASE_READ_ONLY_GETS   route GET/HEAD reads to the read pool (True)
+#   DATABASE_POOL_SIZE        connections kept per pool (env DATABASE_POOL_SIZE)
+#   DATABASE_POOL_OVERFLOW    extra connections allowed under load
+#   SQLITE_PRAGMAS            pragmas run on every new SQLite connection
+
+DEFAULT_SQLITE_PRAGMAS = {
+    # Readers no longer block the writer (and vice versa)
+    'journal_mode': 'WAL',
+    # Durable at checkpoints instead of every commit; safe with WAL
+    'synchronous': 'NORMAL',
+    # Wait for the write lock instead of failing with "database is locked"
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 2**20,
+    # Negative = KiB: 64 MiB page cache per connection
+    'cache_size': -64 * 2**10,
+}
+
+# Pragmas that change the database file, skipped on query-only connections
+WRITE_PRAGMAS = ('journal_mode',)
+
+READ_BIND = 'read'
+
+
+def default_uri():
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url:
+        return database_url
+    db_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'database', 'edulink.db')
+    return 'sqlite:///' + db_path
+
+
+def _is_sqlite_file(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def _engine_options(url, app):
+    if url.get_backend_name() == 'sqlite' and not _is_sqlite_file(url):
+        return {}  # In-memory SQLite uses a single static connection
+    options = {
+        'pool_size': app.config['DATABASE_POOL_SIZE'],
+        'max_overflow': app.config['DATABASE_POOL_OVERFLOW'],
+        'pool_timeout': 30,
+    }
+    if url.get_backend_name() != 'sqlite':
+        # Server databases drop idle connections
+        options.update(pool_pre_ping=True, pool_recycle=1800)
+    return options
+
+
+def configure(app):
+    """
+    Fill in engine, pool and read-bind settings from the final database URI.
+    Call after config overrides are applied and before ``db.init_app``.
+    """
+    app.config.setdefault('DATABASE_READ_ONLY_GETS', True)
+    app.config.setdefault('DATABASE_POOL_SIZE', int(os.environ.get('DATABASE_POOL_SIZE', 5)))
+    app.config.setdefault('DATABASE_POOL_OVERFLOW', int(os.environ.get('DATABASE_POOL_OVERFLOW', 10)))
+    app.config.setdefault('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', _engine_options(url, app))
+
+    read_uri = app.config.get('SQLALCHEMY_READ_URI') or os.environ.get('DATABASE_READ_URL')
+    if not read_uri and _is_sqlite_file(url):
+        read_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if read_uri and app.config['DATABASE_READ_ONLY_GETS']:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(READ_BIND, {'url': read_uri, **_engine_options(make_url(read_uri), app)})
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def install_pragmas(app, engines):
+    """Run SQLITE_PRAGMAS on every new connection of the SQLite ``engines``."""
+    pragmas = app.config['SQLITE_PRAGMAS']
+    for key, engine in engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        read_only = key == READ_BIND
+        event.listen(engine, 'connect', _pragma_listener(pragmas, read_only))
+
+
+def _pragma_listener(pragmas, read_only):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                if read_only and name in WRITE_PRAGMAS:
+                    continue
+                cursor.execute(f'PRAGMA {name} = {value}')
+            if read_only:
+                cursor.execute('PRAGMA query_only = ON')
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the reads of GET/HEAD requests to the read bind (a
+    replica, or a query-only SQLite pool) so they never queue behind
+    writers. Anything that writes (flushes, DML statements, a session
+    with pending changes) and all work outside requests uses the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        if not has_request_context() or request.method not in ('GET', 'HEAD'):
+            return False
+        if self._flushing or self.new or self.dirty or self.deleted:
+            return False
+        return not getattr(clause, 'is_dml', False)
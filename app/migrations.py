@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DatabaseError
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, see _already_applied
+    fcntl = None
+
+
+def _backfill_course_stats():
+    from app.utils import course_stats
+    course_stats.rebuild()
+
+
+def _backfill_progress_counters():
+    from app.utils import course_stats, progress
+    progress.recompute()
+    course_stats.rebuild()
+
+
+# Columns added after the first release. create_all() never alters existing
+# tables, so these are added in place on startup:
+#   (table, column, DDL used by ALTER TABLE ... ADD COLUMN, backfill or None)
+ADDED_COLUMNS = [
+    ('course', 'embedding_pending', 'BOOLEAN NOT NULL DEFAULT 0', None),
+    ('progress', 'completed_lessons', 'INTEGER NOT NULL DEFAULT 0', _backfill_progress_counters),
+    ('progress', 'completed_videos', 'INTEGER NOT NULL DEFAULT 0', _backfill_progress_counters),
+]
+
+
+# Tables added after the first release, with the function that fills them
+# from existing data once they are created.
+ADDED_TABLES = [
+    ('course_stats', _backfill_course_stats),
+]
+
+
+@contextmanager
+def _exclusive(engine):
+    """
+    Hold a lock file next to a SQLite database while upgrading it, so the
+    workers of one server (each runs create_app()) upgrade one at a time
+    and the later ones find nothing left to do.
+    """
+    url = engine.url
+    if fcntl is None or url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        yield
+        return
+    with open(url.database + '.upgrade-lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _already_applied(error):
+    """Whether DDL failed because another process made the same change first."""
+    message = str(error.orig).lower()
+    return 'already exists' in message or 'duplicate column' in message
+
+
+def upgrade_schema(db):
+    """
+    Bring an existing database up to the current models. Idempotent, and
+    safe to run from several processes at once: the schema is inspected
+    under an exclusive lock, and a change another process made first (e.g.
+    on a server database, which the lock doesn't cover) counts as done.
+    """
+    with _exclusive(db.engine):
+        _upgrade(db)
+
+
+def _upgrade(db):
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+
+    if 'course' not in tables:
+        return  # Fresh database: create_all() builds everything
+
+    # Backfills only run in the process that made the change
+    backfills = []
+    for table, column, ddl, backfill in ADDED_COLUMNS:
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column in existing:
+            continue
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+        except DatabaseError as e:
+            if not _already_applied(e):
+                raise
+            continue
+        if backfill and backfill not in backfills:
+            backfills.append(backfill)
+
+    from app import models  # noqa: F401 -- registers the tables on db.metadata
+    for table, backfill in ADDED_TABLES:
+        if table in tables:
+            continue
+        try:
+            db.metadata.tables[table].create(db.engine)
+        except DatabaseError as e:
+            if not _already_applied(e):
+                raise
+            continue
+        backfills.insert(0, backfill)
+
+    # Indexes declared on the models after the tables were first created
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except DatabaseError as e:
+                if not _already_applied(e):
+                    raise
+
+    # Tables first, so column backfills can rely on them
+    for backfill in backfills:
+        backfill()
+
+    # Full-text catalog index (SQLite FTS5), filled from existing courses
+    from app.utils import search
+    if 'course_search' not in tables and search.fts_available(db.engine):
+        search.install(db.engine)
@@ -12,35 +12,49 @@ class Course(db.Model):
     description = db.Column(db.Text, nullable=False)
     class_level = db.Column(db.Integer, nullable=False)
     volunteer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    embedding_pending = db.Column(db.Boolean, nullable=False, default=False)  # waiting for the embedding queue
+
+    lessons = db.relationship("Lesson", order_by="Lesson.id")
+    videos = db.relationship("Video", order_by="Video.id")
+
+    __table_args__ = (
+        db.Index('ix_course_class_level', 'class_level', 'id'),
+        db.Index('ix_course_volunteer_class_level', 'volunteer_id', 'class_level'),
+    )
     
 class Video(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     url = db.Column(db.String(300), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
 
 class Lesson(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
 
 class Progress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     percent_complete = db.Column(db.Float, default=0.0)
+    # Completed-item counters maintained by utils/progress.py
+    completed_lessons = db.Column(db.Integer, nullable=False, default=0)
+    completed_videos = db.Column(db.Integer, nullable=False, default=0)
 
     course = db.relationship("Course", backref="progresses")
 
     __table_args__ = (
         db.UniqueConstraint('student_id', 'course_id', name='unique_progress'),
+        db.Index('ix_progress_course_percent', 'course_id', 'percent_complete'),
     )
 
 
 class Enrollment(db.Model):
     __table_args__ = (
         db.UniqueConstraint('student_id', 'course_id', name='unique_enrollment'),
+        db.Index('ix_enrollment_course_id', 'course_id'),
     )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -52,6 +66,8 @@ class Enrollment(db.Model):
 class LessonProgress(db.Model):
     __table_args__ = (
         db.UniqueConstraint('student_id', 'lesson_id', name='unique_lesson_progress'),
+        # The unique constraint leads with student_id; joins from the course side need this
+        db.Index('ix_lesson_progress_lesson_student', 'lesson_id', 'student_id'),
     )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -62,8 +78,24 @@ class LessonProgress(db.Model):
 class VideoProgress(db.Model):
     __table_args__ = (
         db.UniqueConstraint('student_id', 'video_id', name='unique_video_progress'),
+        db.Index('ix_video_progress_video_student', 'video_id', 'student_id'),
     )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     video_id = db.Column(db.Integer, db.ForeignKey('video.id'), nullable=False)
     completed = db.Column(db.Boolean, default=False)
+
+
+class CourseStats(db.Model):
+    """Per-course counters, kept in step with the write routes (see utils/course_stats.py)."""
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), primary_key=True)
+    enrollment_count = db.Column(db.Integer, nullable=False, default=0)
+    completion_count = db.Column(db.Integer, nullable=False, default=0)
+    lesson_count = db.Column(db.Integer, nullable=False, default=0)
+    video_count = db.Column(db.Integer, nullable=False, default=0)
+
+    course = db.relationship("Course")
+
+    __table_args__ = (
+        db.Index('ix_course_stats_enrollment_count', 'enrollment_count'),
+    )
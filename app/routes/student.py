@@ -1,9 +1,22 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify
-from app.models import db, Course, Enrollment, Lesson, LessonProgress, Progress, Video, VideoProgress
-from app.utils.recommendation import recommend_courses
+from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, stream_template
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import db, Course, CourseStats, Enrollment, Lesson, LessonProgress, Progress, Video, VideoProgress
+from app.utils import course_stats
+from app.utils import progress as progress_service
+from app.utils.pagination import KeysetPage, LimitedResults
+from app.utils.progress_buffer import progress_buffer
+from app.utils.recommendation_cache import recommendation_cache
+from app.utils.search import match_expression, search_courses
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
 
+# Catalog browsing is paginated on (class_level, id); ranked search results
+# can't be, so they are capped instead
+CATALOG_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+SEARCH_RESULT_LIMIT = 100
+SEMANTIC_TOP_K = 10
+
 @student_bp.route('/dashboard')
 def dashboard():
     if session.get('role') != 'student':
@@ -11,6 +24,7 @@ def dashboard():
     enrollments = (
         Enrollment.query
         .filter_by(student_id=session['user_id'])
+        .options(joinedload(Enrollment.course))
         .all()
     )
     return render_template('student_dashboard.html', enrollments=enrollments)
@@ -22,22 +36,64 @@ def watch_course(course_id):
     return render_template('watch_course.html', course=course, videos=videos)
 
 
-@student_bp.route('/courses')
-def courses():
-    # This route allows *guests* to browse
+def catalog_page():
+    """
+    The courses to list for the current request's ``q``, ``class_level``,
+    ``cursor`` and ``per_page`` arguments, as a KeysetPage (browsing) or
+    LimitedResults (search). Rows are read lazily while iterating.
+    """
     search_query = request.args.get("q")
     class_level = request.args.get("class_level")
+    per_page = min(request.args.get("per_page", CATALOG_PAGE_SIZE, type=int), MAX_PAGE_SIZE)
 
-    courses = Course.query
+    # Full-text search over title, description and lessons, best match first
+    courses = search_courses(search_query, class_level)
+    if match_expression(search_query or '') is not None:
+        return LimitedResults(courses, SEARCH_RESULT_LIMIT)
+    return KeysetPage(courses, [Course.class_level, Course.id], request.args.get("cursor"),
+                      max(per_page, 1))
 
-    if class_level:
-        courses = courses.filter_by(class_level=class_level)
 
-    if search_query:
-        courses = courses.filter(Course.title.ilike(f"%{search_query}%"))
+@student_bp.route('/courses')
+def courses():
+    # This route allows *guests* to browse. stream_template renders inside
+    # stream_with_context, so rows are fetched (yield_per) as the page is sent
+    return stream_template('student_courses.html', courses=catalog_page())
+
+@student_bp.route('/courses/feed')
+def courses_feed():
+    # JSON pages of the catalog for infinite scroll; pass next_cursor back
+    # as ?cursor= to get the following page
+    page = catalog_page()
+    courses = [{
+        'id': course.id,
+        'title': course.title,
+        'description': course.description,
+        'class_level': course.class_level,
+    } for course in page]
+    return jsonify({'courses': courses, 'next_cursor': page.next_cursor})
+
+@student_bp.route('/courses/semantic')
+def semantic_courses():
+    # Search by meaning: the query is embedded (cached per distinct query)
+    # and scored against the course vectors already held for recommendations
+    from app.utils.embedding_service import encode_query
+    from app.utils.recommendation import semantic_search
+
+    search_query = request.args.get("q", "")
+    class_level = request.args.get("class_level")
+    if not search_query.strip():
+        return redirect(url_for('student.courses', class_level=class_level or None))
+    top_k = min(request.args.get("top_k", SEMANTIC_TOP_K, type=int), MAX_PAGE_SIZE)
 
-    courses = courses.all()
+    candidate_ids = None
+    if class_level:
+        candidate_ids = [cid for (cid,) in db.session.query(Course.id).filter_by(class_level=class_level)]
+    ranked = semantic_search(encode_query(search_query), candidate_ids, top_k)
 
+    ranked_ids = [cid for cid, _ in ranked]
+    by_id = {c.id: c for c in Course.query.filter(Course.id.in_(ranked_ids))} if ranked_ids else {}
+    courses = [by_id[cid] for cid in ranked_ids if cid in by_id]
     return render_template('student_courses.html', courses=courses)
 
 @student_bp.route('/home')
@@ -45,6 +101,10 @@ def home():
     if session.get("role") != "student":
         return redirect(url_for("auth.login"))
 
+    # Imported on first use: the recommender pulls in numpy and opens the
+    # embedding store, which create_app() and CLI commands don't need
+    from app.utils.recommendation import index_version, recommend_courses
+
     user_id = session["user_id"]
 
     # Get completed courses
@@ -56,14 +116,18 @@ def home():
     )
     completed_ids = [c.course_id for c in completed]
 
-    # All course IDs
-    all_course_ids = [c.id for c in Course.query.all()]
+    def compute_recommendations():
+        # All course IDs
+        all_course_ids = [cid for (cid,) in db.session.query(Course.id)]
+        return recommend_courses(
+            completed_ids=completed_ids,
+            all_course_ids=all_course_ids,
+            top_n=5
+        )
 
-    # Recommended
-    recommended_ids = recommend_courses(
-        completed_ids=completed_ids,
-        all_course_ids=all_course_ids,
-        top_n=5
+    # Recommended (cached until this student's progress changes)
+    recommended_ids = recommendation_cache.get_or_compute(
+        user_id, index_version(), 5, compute_recommendations
     )
 
     recommendations = (
@@ -76,9 +140,9 @@ def home():
     # Popular courses (top 5 by enrollment count)
     popular_courses = (
         db.session.query(Course)
-        .join(Enrollment)
-        .group_by(Course.id)
-        .order_by(db.func.count(Enrollment.id).desc())
+        .join(CourseStats, CourseStats.course_id == Course.id)
+        .filter(CourseStats.enrollment_count > 0)
+        .order_by(CourseStats.enrollment_count.desc())
         .limit(5)
         .all()
     )
@@ -97,21 +161,27 @@ def enroll(course_id):
     student_id = session['user_id']
     existing = Enrollment.query.filter_by(student_id=student_id, course_id=course_id).first()
     if existing:
-        courses = Course.query.all()
-        return render_template('student_courses.html', courses=courses, error="You are already enrolled in this course.")
+        return stream_template('student_courses.html', courses=catalog_page(),
+                               error="You are already enrolled in this course.")
     enrollment = Enrollment(student_id=student_id, course_id=course_id)
     db.session.add(enrollment)
     progress = Progress(student_id=student_id, course_id=course_id, percent_complete=0.0)
     db.session.add(progress)
+    course_stats.bump(course_id, enrollment_count=1)
     db.session.commit()
     return redirect(url_for('student.dashboard'))
 
 @student_bp.route('/course/<int:course_id>')
 def course_detail(course_id):
     # Allow guests to view course details
-    course = Course.query.get_or_404(course_id)
-    lessons = Lesson.query.filter_by(course_id=course_id).all()
-    videos = Video.query.filter_by(course_id=course_id).all()  # Added videos
+    course = (
+        Course.query
+        .options(selectinload(Course.lessons), selectinload(Course.videos))
+        .filter_by(id=course_id)
+        .first_or_404()
+    )
+    lessons = course.lessons
+    videos = course.videos
 
     progress = None
     lesson_progress = {}
@@ -124,23 +194,25 @@ def course_detail(course_id):
             student_id=user_id
         ).first()
         
-        # Get lesson completion status
-        completed_lessons = LessonProgress.query.filter_by(
-            student_id=user_id
-        ).join(Lesson, LessonProgress.lesson_id == Lesson.id).filter(
-            Lesson.course_id == course_id,
+        # Completed lessons and videos of this course in one query
+        completed = db.session.query(
+            LessonProgress.lesson_id, db.literal('lesson')
+        ).filter(
+            LessonProgress.student_id == user_id,
+            LessonProgress.lesson_id.in_([lesson.id for lesson in lessons]),
             LessonProgress.completed == True
-        ).all()
-        lesson_progress = {lp.lesson_id: lp.completed for lp in completed_lessons}
-        
-        # Get video completion status  
-        completed_videos = VideoProgress.query.filter_by(
-            student_id=user_id
-        ).join(Video, VideoProgress.video_id == Video.id).filter(
-            Video.course_id == course_id,
-            VideoProgress.completed == True
-        ).all()
-        video_progress = {vp.video_id: vp.completed for vp in completed_videos}
+        ).union_all(
+            db.session.query(VideoProgress.video_id, db.literal('video')).filter(
+                VideoProgress.student_id == user_id,
+                VideoProgress.video_id.in_([video.id for video in videos]),
+                VideoProgress.completed == True
+            )
+        )
+        for item_id, kind in completed:
+            if kind == 'lesson':
+                lesson_progress[item_id] = True
+            else:
+                video_progress[item_id] = True
 
     return render_template(
         'course_detail.html',
@@ -158,8 +230,13 @@ def update_progress(course_id):
         return redirect(url_for('auth.login'))
     progress = Progress.query.filter_by(course_id=course_id, student_id=session['user_id']).first()
     if progress:
+        old_percent = progress.percent_complete
         progress.percent_complete = min(progress.percent_complete + 25.0, 100.0)
+        course_stats.bump(course_id, completion_count=course_stats.completion_delta(
+            old_percent, progress.percent_complete
+        ))
         db.session.commit()
+        recommendation_cache.invalidate(session['user_id'])
     return redirect(url_for('student.course_detail', course_id=course_id))
 
 @student_bp.route('/lesson/<int:lesson_id>/complete', methods=['POST'])
@@ -169,59 +246,13 @@ def complete_lesson(lesson_id):
     
     user_id = session['user_id']
     lesson = Lesson.query.get_or_404(lesson_id)
-    course_id = lesson.course_id
-    
-    # Mark lesson as completed
-    progress = LessonProgress.query.filter_by(
-        student_id=user_id,
-        lesson_id=lesson_id
-    ).first()
-    if not progress:
-        progress = LessonProgress(student_id=user_id, lesson_id=lesson_id, completed=True)
-        db.session.add(progress)
-    else:
-        progress.completed = True
-
-    # Calculate progress from videos
-    total_videos = Video.query.filter_by(course_id=course_id).count()
-    completed_videos = VideoProgress.query.filter_by(
-        student_id=user_id
-    ).join(Video, VideoProgress.video_id == Video.id).filter(
-        Video.course_id == course_id,
-        VideoProgress.completed == True
-    ).count()
-    
-    # Calculate progress from lessons
-    total_lessons = Lesson.query.filter_by(course_id=course_id).count()
-    completed_lessons = LessonProgress.query.filter_by(
-        student_id=user_id
-    ).join(Lesson, LessonProgress.lesson_id == Lesson.id).filter(
-        Lesson.course_id == course_id,
-        LessonProgress.completed == True
-    ).count()
-    
-    # Calculate overall progress (considering both videos and lessons)
-    total_items = total_videos + total_lessons
-    completed_items = completed_videos + completed_lessons
-    percent_complete = (completed_items / total_items) * 100 if total_items > 0 else 0
-
-    # Update course progress
-    course_progress = Progress.query.filter_by(
-        course_id=course_id,
-        student_id=user_id
-    ).first()
-    if course_progress:
-        course_progress.percent_complete = percent_complete
-    else:
-        course_progress = Progress(
-            course_id=course_id,
-            student_id=user_id,
-            percent_complete=percent_complete
-        )
-        db.session.add(course_progress)
-    
-    db.session.commit()
-    return redirect(url_for('student.course_detail', course_id=course_id))
+
+    # Mark lesson as completed and update course progress
+    _, newly_completed = progress_service.complete_lesson(user_id, lesson)
+    if newly_completed:
+        db.session.commit()
+        recommendation_cache.invalidate(user_id)
+    return redirect(url_for('student.course_detail', course_id=lesson.course_id))
 
 @student_bp.route('/complete_video/<int:video_id>', methods=['POST'])
 def complete_video(video_id):
@@ -231,80 +262,42 @@ def complete_video(video_id):
     video = Video.query.get_or_404(video_id)
     user_id = session['user_id']
 
-    # Check if already completed
-    existing_vp = VideoProgress.query.filter_by(student_id=user_id, video_id=video_id).first()
-    if existing_vp and existing_vp.completed:
+    is_json = request.content_type == 'application/json' or request.headers.get('Content-Type') == 'application/json'
+
+    # Mark video progress and update course-level progress
+    if progress_buffer.enabled and is_json:
+        # Acknowledged now, written with the next batch
+        summary, newly_completed = progress_buffer.complete_video(user_id, video)
+    else:
+        summary, newly_completed = progress_service.complete_video(user_id, video)
+        if newly_completed:
+            db.session.commit()
+            recommendation_cache.invalidate(user_id)
+
+    if not newly_completed:
         # Already completed - return success for AJAX or redirect for form
-        if request.content_type == 'application/json' or request.headers.get('Content-Type') == 'application/json':
+        if is_json:
             return jsonify({
                 'success': True, 
                 'message': 'Video already completed',
-                'progress_percent': get_course_progress_percent(user_id, video.course_id)
+                'progress_percent': summary['percent_complete']
             })
         else:
             return redirect(url_for('student.course_detail', course_id=video.course_id))
 
-    # Mark video progress
-    if not existing_vp:
-        vp = VideoProgress(student_id=user_id, video_id=video_id, completed=True)
-        db.session.add(vp)
-    else:
-        existing_vp.completed = True
-
-    # Update course-level progress based on both videos and lessons
-    course_id = video.course_id
-    
-    # Calculate progress from videos
-    total_videos = Video.query.filter_by(course_id=course_id).count()
-    completed_videos = VideoProgress.query.filter_by(
-        student_id=user_id
-    ).join(Video, VideoProgress.video_id == Video.id).filter(
-        Video.course_id == course_id,
-        VideoProgress.completed == True
-    ).count()
-    
-    # Calculate progress from lessons
-    total_lessons = Lesson.query.filter_by(course_id=course_id).count()
-    completed_lessons = LessonProgress.query.filter_by(
-        student_id=user_id
-    ).join(Lesson, LessonProgress.lesson_id == Lesson.id).filter(
-        Lesson.course_id == course_id,
-        LessonProgress.completed == True
-    ).count()
-    
-    # Calculate overall progress (considering both videos and lessons)
-    total_items = total_videos + total_lessons
-    completed_items = completed_videos + completed_lessons
-    percent = (completed_items / total_items) * 100 if total_items > 0 else 0
-
-    # Update course progress
-    progress = Progress.query.filter_by(student_id=user_id, course_id=course_id).first()
-    if not progress:
-        progress = Progress(student_id=user_id, course_id=course_id, percent_complete=percent)
-        db.session.add(progress)
-    else:
-        progress.percent_complete = percent
-
-    db.session.commit()
-    
     # Return appropriate response
-    if request.content_type == 'application/json' or request.headers.get('Content-Type') == 'application/json':
+    if is_json:
         return jsonify({
             'success': True,
             'message': 'Video completed successfully!',
-            'progress_percent': percent,
-            'completed_videos': completed_videos,
-            'total_videos': total_videos,
-            'completed_lessons': completed_lessons,
-            'total_lessons': total_lessons
+            'progress_percent': summary['percent_complete'],
+            'completed_videos': summary['completed_videos'],
+            'total_videos': summary['total_videos'],
+            'completed_lessons': summary['completed_lessons'],
+            'total_lessons': summary['total_lessons']
         })
     else:
-        return redirect(url_for('student.course_detail', course_id=course_id))
-
-def get_course_progress_percent(student_id, course_id):
-    """Helper function to get current course progress percentage"""
-    progress = Progress.query.filter_by(student_id=student_id, course_id=course_id).first()
-    return progress.percent_complete if progress else 0
+        return redirect(url_for('student.course_detail', course_id=video.course_id))
 
 @student_bp.route('/course/<int:course_id>/progress', methods=['GET'])
 def get_course_progress(course_id):
@@ -312,37 +305,6 @@ def get_course_progress(course_id):
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    user_id = session['user_id']
-    
-    # Get video progress
-    total_videos = Video.query.filter_by(course_id=course_id).count()
-    completed_videos = VideoProgress.query.filter_by(
-        student_id=user_id
-    ).join(Video, VideoProgress.video_id == Video.id).filter(
-        Video.course_id == course_id,
-        VideoProgress.completed == True
-    ).count()
-    
-    # Get lesson progress
-    total_lessons = Lesson.query.filter_by(course_id=course_id).count()
-    completed_lessons = LessonProgress.query.filter_by(
-        student_id=user_id
-    ).join(Lesson, LessonProgress.lesson_id == Lesson.id).filter(
-        Lesson.course_id == course_id,
-        LessonProgress.completed == True
-    ).count()
-    
-    # Calculate overall progress
-    total_items = total_videos + total_lessons
-    completed_items = completed_videos + completed_lessons
-    percent_complete = (completed_items / total_items) * 100 if total_items > 0 else 0
-    
-    return jsonify({
-        'percent_complete': round(percent_complete, 1),
-        'completed_videos': completed_videos,
-        'total_videos': total_videos,
-        'completed_lessons': completed_lessons,
-        'total_lessons': total_lessons,
-        'completed_items': completed_items,
-        'total_items': total_items
-    })
+    summary = progress_buffer.course_progress(session['user_id'], course_id)
+    summary['percent_complete'] = round(summary['percent_complete'], 1)
+    return jsonify(summary)
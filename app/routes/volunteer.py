@@ -1,14 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session
-from app.models import db, Course, Lesson, Enrollment, Progress, Video, VideoProgress
-from sentence_transformers import SentenceTransformer
-import pickle
-import os
+from app.models import db, Course, CourseStats, Lesson, Video, VideoProgress
+from app.utils import course_stats
+from app.utils import progress as progress_service
+from app.utils.embedding_queue import embedding_queue
+from app.utils.recommendation_cache import recommendation_cache
 
 bp = Blueprint('volunteer', __name__, url_prefix='/volunteer')
 
-# Load model (you can move this to a separate utils.py if you prefer)
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
 
 @bp.route('/dashboard')
 def dashboard():
@@ -25,28 +23,30 @@ def dashboard():
     if class_filter:
         courses_query = courses_query.filter_by(class_level=class_filter)
     
-    courses = courses_query.all()
+    # Per-course counts come from the materialized CourseStats rows
+    rows = (
+        courses_query
+        .add_columns(
+            db.func.coalesce(CourseStats.enrollment_count, 0),
+            db.func.coalesce(CourseStats.completion_count, 0),
+            db.func.coalesce(CourseStats.video_count, 0),
+            db.func.coalesce(CourseStats.lesson_count, 0),
+        )
+        .outerjoin(CourseStats, CourseStats.course_id == Course.id)
+        .all()
+    )
 
     # Attach enrollment and completion counts
-    course_data = []
-    for course in courses:
-        enrollment_count = Enrollment.query.filter_by(course_id=course.id).count()
-        completed_count = Progress.query.filter(
-            Progress.course_id == course.id,
-            Progress.percent_complete >= 100
-        ).count()
-        
-        # Get video and lesson counts
-        video_count = Video.query.filter_by(course_id=course.id).count()
-        lesson_count = Lesson.query.filter_by(course_id=course.id).count()
-        
-        course_data.append({
+    course_data = [
+        {
             'course': course,
             'enrollment_count': enrollment_count,
             'completed_count': completed_count,
             'video_count': video_count,
             'lesson_count': lesson_count
-        })
+        }
+        for course, enrollment_count, completed_count, video_count, lesson_count in rows
+    ]
 
     # Get all available class levels for the filter dropdown
     available_classes = db.session.query(Course.class_level).filter_by(
@@ -76,7 +76,8 @@ def create():
             title=title,
             description=description,
             class_level=class_level,
-            volunteer_id=session["user_id"]
+            volunteer_id=session["user_id"],
+            embedding_pending=True
         )
         db.session.add(new_course)
         db.session.flush()  # Assigns new_course.id without committing yet
@@ -105,29 +106,14 @@ def create():
             )
         ]
         db.session.bulk_save_objects(default_lessons)
+        course_stats.bump(new_course.id, lesson_count=len(default_lessons))
         db.session.flush()
 
-        # Encode embedding
-        text = f"{title}. {description}"
-        embedding = model.encode(text)
-
-        # Load existing embeddings (with proper file path)
-        embeddings_file = os.path.join(os.path.dirname(__file__), '..', '..', 'course_embeddings.pkl')
-        if os.path.exists(embeddings_file):
-            with open(embeddings_file, "rb") as f:
-                embeddings = pickle.load(f)
-        else:
-            embeddings = {}
-
-        # Add new embedding
-        embeddings[new_course.id] = embedding
-
-        # Save embeddings
-        with open(embeddings_file, "wb") as f:
-            pickle.dump(embeddings, f)
-
         db.session.commit()  # Commit everything together
 
+        # Embedding happens in the background; the course is marked pending until then
+        embedding_queue.enqueue(new_course.id)
+
         return redirect(url_for("volunteer.dashboard"))
 
     return render_template("volunteer_create.html")
@@ -143,7 +129,11 @@ def add_lesson(course_id):
         content = request.form['content']
         lesson = Lesson(title=title, content=content, course_id=course_id)
         db.session.add(lesson)
+        # A bigger course: every enrolled student's percent drops
+        changed = progress_service.items_changed(course_id, lessons=1)
         db.session.commit()
+        for student_id in changed:
+            recommendation_cache.invalidate(student_id)
         return redirect(url_for('volunteer.dashboard'))
 
     return render_template('add_lesson.html')
@@ -176,7 +166,10 @@ def add_video(course_id):
         try:
             video = Video(title=title, url=embed_url, course_id=course_id)
             db.session.add(video)
+            changed = progress_service.items_changed(course_id, videos=1)
             db.session.commit()
+            for student_id in changed:
+                recommendation_cache.invalidate(student_id)
             return redirect(url_for('student.course_detail', course_id=course_id))
         except Exception as e:
             db.session.rollback()
@@ -211,12 +204,17 @@ def delete_video(video_id):
         return redirect(url_for('volunteer.dashboard'))
     
     try:
-        # Delete associated video progress records first
+        # Drop it from students' counters and the course's totals, then
+        # delete associated video progress records first
+        changed = progress_service.forget_video(video)
         VideoProgress.query.filter_by(video_id=video_id).delete()
         
         # Delete the video
         db.session.delete(video)
         db.session.commit()
+        # Students who finished or un-finished the course by this
+        for student_id in changed:
+            recommendation_cache.invalidate(student_id)
         
         return redirect(url_for('volunteer.manage_videos', course_id=course.id))
     except Exception as e:
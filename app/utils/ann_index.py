@@ -0,0 +1,174 @@
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index over an EmbeddingIndex.
+
+    Course vectors are partitioned with spherical k-means into ``n_lists``
+    inverted lists. A query is only scored against the courses in the
+    ``n_probe`` lists whose centroids are closest to it, so raising
+    ``n_probe`` trades latency for recall (``n_probe == n_lists`` is exact).
+    """
+
+    def __init__(self, index, centroids, assignments, n_probe=8):
+        self.index = index
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int64)
+        self.n_probe = n_probe
+
+        # Rows grouped by list: rows of list i are order[offsets[i]:offsets[i + 1]]
+        self.order = np.argsort(self.assignments, kind='stable')
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, index, n_lists=None, n_probe=8, n_iter=20, seed=0):
+        """Cluster the normalized course matrix into ``n_lists`` partitions."""
+        n = len(index.ids)
+        if n == 0:
+            return cls(index, np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64), n_probe)
+        if n_lists is None:
+            n_lists = int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+
+        data = index.dense()
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(n, n_lists, replace=False)].copy()
+        assignments = np.zeros(n, dtype=np.int64)
+
+        for iteration in range(n_iter):
+            new_assignments = np.argmax(data @ centroids.T, axis=1)
+            if iteration and np.array_equal(new_assignments, assignments):
+                break
+            assignments = new_assignments
+
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, data)
+            norms = np.linalg.norm(sums, axis=1)
+            empty = norms == 0
+            # Re-seed empty lists from random rows so every list stays usable
+            if empty.any():
+                sums[empty] = data[rng.choice(n, int(empty.sum()), replace=False)]
+                norms[empty] = 1.0
+            centroids = sums / norms[:, None]
+
+        return cls(index, centroids, assignments, n_probe)
+
+    def extend(self, index):
+        """
+        IVF index over ``index``, an extension of this one's EmbeddingIndex.
+        New rows are assigned to their nearest existing centroid; call
+        ``build`` again if the catalog has grown a lot.
+        """
+        new_rows = index.dense(slice(len(self.assignments), None))
+        new_assignments = np.argmax(new_rows @ self.centroids.T, axis=1) if len(new_rows) else []
+        assignments = np.concatenate((self.assignments, np.asarray(new_assignments, dtype=np.int64)))
+        return IVFIndex(index, self.centroids, assignments, self.n_probe)
+
+    def search(self, query, top_n, mask=None, n_probe=None):
+        """
+        Same contract as EmbeddingIndex.search, but only scores the rows of
+        the ``n_probe`` closest lists. More lists are probed if the allowed
+        candidates in those lists are fewer than ``top_n``.
+        """
+        if len(self.index) == 0 or top_n <= 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        query = query / query_norm
+
+        if mask is None:
+            mask = self.index.live
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        list_order = np.argsort(-(self.centroids @ query))
+
+        rows = np.empty(0, dtype=np.int64)
+        probed = 0
+        while probed < self.n_lists:
+            step = n_probe if probed == 0 else 1
+            for lst in list_order[probed:probed + step]:
+                list_rows = self.order[self.offsets[lst]:self.offsets[lst + 1]]
+                if mask is not None:
+                    list_rows = list_rows[mask[list_rows]]
+                rows = np.concatenate((rows, list_rows))
+            probed += step
+            if len(rows) >= top_n:
+                break
+
+        if len(rows) == 0:
+            return []
+
+        rows = np.sort(rows)
+        scores = self.index.dense(rows) @ query
+        k = min(top_n, len(rows))
+        if k < len(rows):
+            top = np.sort(np.argpartition(-scores, k - 1)[:k])
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.index.ids[rows[i]]), float(scores[i])) for i in top]
+
+    def save(self, path):
+        """Persist centroids and assignments (plus ids, to detect staleness)."""
+        # A private temp file per writer: workers rebuilding at the same
+        # time each replace the file with a complete copy
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, ids=self.index.ids, centroids=self.centroids,
+                         assignments=self.assignments)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, index, n_probe=8):
+        """
+        Load a saved index. Returns None if the file is missing, unreadable
+        (truncated or corrupt) or was built for a different set of courses
+        than ``index``, so the caller rebuilds it.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if not np.array_equal(data['ids'], index.ids):
+                    return None
+                return cls(index, data['centroids'], data['assignments'], n_probe)
+        except (zipfile.BadZipFile, KeyError, ValueError, OSError):
+            return None
+
+    @classmethod
+    def load_or_build(cls, path, index, n_lists=None, n_probe=8):
+        """Load the persisted index, rebuilding and saving it if stale."""
+        ann = cls.load(path, index, n_probe=n_probe)
+        if ann is None:
+            ann = cls.build(index, n_lists=n_lists, n_probe=n_probe)
+            try:
+                ann.save(path)
+            except OSError:
+                pass  # Read-only deploys still get the in-memory index
+        return ann
+
+
+def recall_at_k(exact_results, approx_results):
+    """Fraction of exact top-k ids that the approximate search also returned."""
+    exact_ids = {cid for cid, _ in exact_results}
+    if not exact_ids:
+        return 1.0
+    approx_ids = {cid for cid, _ in approx_results}
+    return len(exact_ids & approx_ids) / len(exact_ids)
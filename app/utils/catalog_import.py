@@ -0,0 +1,223 @@
+import csv
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from types import SimpleNamespace
+
+from app import db
+from app.models import Course, CourseStats, Lesson, Video
+from app.utils import embedding_service, progress
+from app.utils.embedding_queue import course_text
+from app.utils.recommendation_cache import recommendation_cache
+
+logger = logging.getLogger(__name__)
+
+
+def read_jsonl(path):
+    """
+    Course records from a JSONL file, one course per line::
+
+        {"title": "...", "description": "...", "class_level": 5, "volunteer_id": 1,
+         "lessons": [{"title": "...", "content": "..."}],
+         "videos": [{"title": "...", "url": "..."}]}
+
+    ``volunteer_id``, ``lessons`` and ``videos`` are optional.
+    """
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from None
+
+
+def read_csv(path):
+    """
+    Rows of a CSV file with a header line, as dicts. Course files have
+    ``title, description, class_level`` and optionally ``volunteer_id`` and
+    ``key``; lesson and video files have ``course_key`` plus
+    ``title, content`` or ``title, url``.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _course_row(record, default_volunteer_id):
+    try:
+        volunteer_id = record.get('volunteer_id') or default_volunteer_id
+        if volunteer_id is None:
+            raise ValueError("no volunteer_id (pass a default volunteer)")
+        return {
+            'title': record['title'],
+            'description': record.get('description') or '',
+            'class_level': int(record['class_level']),
+            'volunteer_id': int(volunteer_id),
+            'embedding_pending': True,
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"invalid course record {record.get('title')!r}: {e!r}") from None
+
+
+def _item_row(model, course_id, record, course):
+    """A Lesson or Video row for ``course_id``; ``course`` names the course in errors."""
+    fields = ('title', 'content') if model is Lesson else ('title', 'url')
+    try:
+        row = {'course_id': course_id}
+        for name in fields:
+            if record[name] is None:
+                raise KeyError(name)
+            row[name] = record[name]
+        return row
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"invalid {model.__tablename__} record in course {course!r}: {e!r}") from None
+
+
+def _encode(course_ids, texts):
+    return course_ids, embedding_service.encode(texts)
+
+
+def _store_vectors(future, course_ids):
+    """
+    Save one chunk's embeddings and take its courses off the pending list.
+    If encoding failed the courses stay pending; returns how many were stored.
+    """
+    from app.utils.recommendation import save_embeddings
+
+    try:
+        _, vectors = future.result()
+    except Exception:
+        logger.exception("Encoding courses %d-%d failed; they stay pending for `flask embed-pending`",
+                         course_ids[0], course_ids[-1])
+        return 0
+    save_embeddings(dict(zip(course_ids, vectors)))
+    with db.engine.begin() as conn:
+        conn.execute(
+            db.update(Course).where(Course.id.in_(course_ids)).values(embedding_pending=False)
+        )
+    return len(course_ids)
+
+
+def import_catalog(records, chunk_size=1000, volunteer_id=None, embed=True,
+                   encode_workers=1, on_chunk=None):
+    """
+    Bulk-insert course records (as yielded by ``read_jsonl`` / ``read_csv``)
+    with their nested lessons and videos. Needs an app context.
+
+    Records are consumed lazily and written ``chunk_size`` courses per
+    transaction with executemany inserts, CourseStats rows included. A
+    record with a missing field raises ValueError and rolls back its chunk.
+    Courses are inserted with ``embedding_pending`` set; unless ``embed``
+    is False each chunk is encoded in one batch on ``encode_workers``
+    background threads while the next chunk is inserted, then written to
+    the embedding store and cleared. Courses whose encoding didn't happen
+    or failed (logged, the import carries on) stay pending for the
+    embedding queue (``flask embed-pending``).
+
+    Returns ``(counts, keys)``: counts of courses/lessons/videos/embedded
+    rows and of courses left pending, and ``{record key: course id}`` for
+    records with a ``key``.
+    ``on_chunk(counts)`` is called after each committed chunk.
+    """
+    counts = {'courses': 0, 'lessons': 0, 'videos': 0, 'embedded': 0, 'pending': 0}
+    keys = {}
+    pending = {}  # encode future -> its chunk's course ids
+
+    with ThreadPoolExecutor(max_workers=encode_workers) as executor:
+        for chunk in _chunks(records, chunk_size):
+            course_rows = [_course_row(record, volunteer_id) for record in chunk]
+
+            with db.engine.begin() as conn:
+                course_ids = conn.execute(
+                    db.insert(Course).returning(Course.id, sort_by_parameter_order=True),
+                    course_rows
+                ).scalars().all()
+
+                lesson_rows, video_rows, stats_rows = [], [], []
+                for course_id, record in zip(course_ids, chunk):
+                    lessons = record.get('lessons') or []
+                    videos = record.get('videos') or []
+                    lesson_rows += [_item_row(Lesson, course_id, l, record['title']) for l in lessons]
+                    video_rows += [_item_row(Video, course_id, v, record['title']) for v in videos]
+                    stats_rows.append({'course_id': course_id, 'enrollment_count': 0, 'completion_count': 0,
+                                       'lesson_count': len(lessons), 'video_count': len(videos)})
+                    if record.get('key') is not None:
+                        keys[record['key']] = course_id
+                if lesson_rows:
+                    conn.execute(db.insert(Lesson), lesson_rows)
+                if video_rows:
+                    conn.execute(db.insert(Video), video_rows)
+                conn.execute(db.insert(CourseStats), stats_rows)
+
+            counts['courses'] += len(course_ids)
+            counts['lessons'] += len(lesson_rows)
+            counts['videos'] += len(video_rows)
+
+            if embed:
+                texts = [course_text(SimpleNamespace(**row)) for row in course_rows]
+                pending[executor.submit(_encode, course_ids, texts)] = course_ids
+                # Keep at most one chunk per worker in flight
+                while len(pending) > encode_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    counts['embedded'] += sum(_store_vectors(future, pending.pop(future)) for future in done)
+            counts['pending'] = counts['courses'] - counts['embedded']
+            if on_chunk:
+                on_chunk(counts)
+
+        for future, course_ids in pending.items():
+            counts['embedded'] += _store_vectors(future, course_ids)
+    counts['pending'] = counts['courses'] - counts['embedded']
+    return counts, keys
+
+
+def import_items(model, rows, keys, chunk_size=1000, on_chunk=None):
+    """
+    Bulk-insert lesson or video rows (``model`` is Lesson or Video) that
+    reference their course by ``course_key``, a key from ``import_catalog``.
+    Updates CourseStats, and the percent of students already enrolled in
+    those courses, in the same transactions, and invalidates the cached
+    recommendations of students whose completions changed. Returns the
+    row count.
+    """
+    counter = CourseStats.lesson_count if model is Lesson else CourseStats.video_count
+    total = 0
+    for chunk in _chunks(rows, chunk_size):
+        item_rows, per_course = [], {}
+        for row in chunk:
+            try:
+                course_id = keys[row['course_key']]
+            except KeyError:
+                raise ValueError(f"unknown course_key {row.get('course_key')!r}") from None
+            item_rows.append(_item_row(model, course_id, row, row['course_key']))
+            per_course[course_id] = per_course.get(course_id, 0) + 1
+
+        with db.engine.begin() as conn:
+            conn.execute(db.insert(model), item_rows)
+            conn.execute(
+                db.update(CourseStats)
+                .where(CourseStats.course_id == db.bindparam('cid'))
+                .values({counter.key: counter + db.bindparam('n')}),
+                [{'cid': cid, 'n': n} for cid, n in per_course.items()]
+            )
+            changed = progress.rescore(per_course, connection=conn)
+        for student_id in changed:
+            recommendation_cache.invalidate(student_id)
+        total += len(item_rows)
+        if on_chunk:
+            on_chunk(total)
+    return total
+
+
+def rate(count, start):
+    """``count`` per second since ``start`` (a time.perf_counter() value)."""
+    elapsed = time.perf_counter() - start
+    return count / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,95 @@
+from app import db
+from app.models import Course, CourseStats, Enrollment, Progress, Lesson, Video
+
+COUNTERS = ('enrollment_count', 'completion_count', 'lesson_count', 'video_count')
+
+
+def bump(course_id, **deltas):
+    """
+    Add ``deltas`` (e.g. ``enrollment_count=1``) to a course's counters in the
+    current transaction, creating its stats row if needed.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    # Make sure pending ORM changes are flushed before the Core statement
+    db.session.flush()
+    updated = db.session.execute(
+        db.update(CourseStats)
+        .where(CourseStats.course_id == course_id)
+        .values({name: getattr(CourseStats, name) + delta for name, delta in deltas.items()})
+    ).rowcount
+    if not updated:
+        db.session.execute(
+            db.insert(CourseStats).values(course_id=course_id, **{
+                name: deltas.get(name, 0) for name in COUNTERS
+            })
+        )
+
+
+def completion_delta(old_percent, new_percent):
+    """+1 / -1 / 0 change in completions when a course's progress moves."""
+    was_complete = old_percent is not None and old_percent >= 100
+    is_complete = new_percent is not None and new_percent >= 100
+    return int(is_complete) - int(was_complete)
+
+
+def computed_stats():
+    """``{course_id: (enrollments, completions, lessons, videos)}`` from the source tables."""
+    def count_by_course(column, *criteria):
+        return (
+            db.session.query(column.label('course_id'), db.func.count().label('n'))
+            .filter(*criteria)
+            .group_by(column)
+            .subquery()
+        )
+
+    enrollments = count_by_course(Enrollment.course_id)
+    completions = count_by_course(Progress.course_id, Progress.percent_complete >= 100)
+    lessons = count_by_course(Lesson.course_id)
+    videos = count_by_course(Video.course_id)
+
+    rows = (
+        db.session.query(
+            Course.id,
+            db.func.coalesce(enrollments.c.n, 0),
+            db.func.coalesce(completions.c.n, 0),
+            db.func.coalesce(lessons.c.n, 0),
+            db.func.coalesce(videos.c.n, 0),
+        )
+        .outerjoin(enrollments, enrollments.c.course_id == Course.id)
+        .outerjoin(completions, completions.c.course_id == Course.id)
+        .outerjoin(lessons, lessons.c.course_id == Course.id)
+        .outerjoin(videos, videos.c.course_id == Course.id)
+    )
+    return {course_id: tuple(counts) for course_id, *counts in rows}
+
+
+def verify():
+    """List of ``(course_id, stored, expected)`` for every course whose stats drifted."""
+    stored = {
+        s.course_id: tuple(getattr(s, name) for name in COUNTERS)
+        for s in CourseStats.query
+    }
+    expected = computed_stats()
+    drift = []
+    for course_id in sorted(set(stored) | set(expected)):
+        have = stored.get(course_id)
+        want = expected.get(course_id)
+        if have != want:
+            drift.append((course_id, have, want))
+    return drift
+
+
+def rebuild():
+    """Recompute every course's stats from the source tables (commits)."""
+    expected = computed_stats()
+    db.session.execute(db.delete(CourseStats))
+    if expected:
+        db.session.execute(db.insert(CourseStats), [
+            dict(course_id=course_id, **dict(zip(COUNTERS, counts)))
+            for course_id, counts in expected.items()
+        ])
+    db.session.commit()
+    return len(expected)
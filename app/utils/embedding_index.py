@@ -0,0 +1,284 @@
+import numpy as np
+
+# Row encodings: float16 halves memory; int8 quarters it, with one float32
+# scale per row so each vector uses the full int8 range
+DTYPES = ('float32', 'float16', 'int8')
+
+
+def quantize(vectors, dtype):
+    """
+    Encode L2-normalized float32 rows as ``dtype``. Returns
+    ``(matrix, scales)``; ``scales`` is None except for int8, where row i
+    decodes to ``matrix[i] * scales[i]``.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == 'float32':
+        return vectors, None
+    if dtype == 'float16':
+        return vectors.astype(np.float16), None
+    if dtype == 'int8':
+        peak = np.abs(vectors).max(axis=1) if vectors.size else np.empty(0, dtype=np.float32)
+        scales = (np.where(peak > 0, peak, 1.0) / 127).astype(np.float32)
+        return np.rint(vectors / scales[:, None]).astype(np.int8), scales
+    raise ValueError(f"Unknown embedding dtype {dtype!r} (expected one of {', '.join(DTYPES)})")
+
+
+def _as_matrix(matrix):
+    # Quantized matrices are kept as they are (often a memmap); anything
+    # else is scored as contiguous float32
+    if matrix.dtype in (np.float16, np.int8):
+        return matrix
+    return np.ascontiguousarray(matrix, dtype=np.float32)
+
+
+class EmbeddingIndex:
+    """
+    In-memory index of course embeddings.
+
+    All vectors live in one contiguous float32 matrix whose rows are
+    L2-normalized, so cosine similarity against every course is a single
+    matrix-vector product. ``ids`` maps row -> course id and ``rows`` maps
+    course id -> row. The matrix may be a read-only np.memmap.
+
+    The matrix may also be float16, or int8 with per-row ``scales`` (see
+    ``quantize``). Quantized rows are decoded to float32 a block at a time
+    while scoring, so the full-precision matrix never exists in memory.
+
+    If a course id appears on several rows (an append-only store where a
+    course was re-embedded) the last row wins and earlier rows are masked
+    out of every search.
+    """
+
+    # Rows decoded per step when scoring a quantized matrix; small enough
+    # that the decoded block stays in cache
+    SCORE_BLOCK = 1024
+
+    def __init__(self, ids, matrix, norms, scales=None, superseded=None):
+        """
+        ``superseded`` says whether any id repeats, if the caller knows
+        (EmbeddingStore records it in its manifest); None checks, which
+        sorts every id.
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.matrix = _as_matrix(matrix)
+        self.norms = np.asarray(norms, dtype=np.float32)
+        self.scales = None if scales is None else np.asarray(scales, dtype=np.float32)
+        self._rows = None
+        self.version = None  # set by EmbeddingStore: (generation, row count)
+
+        self.live = None
+        if superseded is None:
+            superseded = len(np.unique(self.ids)) != len(self.ids)
+        if superseded:
+            _, last_from_end = np.unique(self.ids[::-1], return_index=True)
+            self.live = np.zeros(len(self.ids), dtype=bool)
+            self.live[len(self.ids) - 1 - last_from_end] = True
+
+    @property
+    def rows(self):
+        # Built on first use so opening a memory-mapped index stays cheap
+        if self._rows is None:
+            self._rows = {int(cid): row for row, cid in enumerate(self.ids)}
+        return self._rows
+
+    def extend(self, ids, norms, matrix, scales=None):
+        """
+        New index with rows appended, sharing this index's arrays where possible.
+
+        ``matrix`` must hold this index's rows followed by the new ones (e.g. a
+        longer memory map of the same file), in the same encoding; ``scales``
+        are the new rows' scales for an int8 matrix.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        start = len(self.ids)
+
+        rows = dict(self.rows)
+        if self.live is None:
+            live = np.ones(start + len(ids), dtype=bool)
+        else:
+            live = np.concatenate((self.live, np.ones(len(ids), dtype=bool)))
+        superseded = self.live is not None
+        for offset, cid in enumerate(ids.tolist()):
+            if cid in rows:
+                # A re-embedded course: hide its previous row
+                live[rows[cid]] = False
+                superseded = True
+            rows[cid] = start + offset
+
+        extended = EmbeddingIndex.__new__(EmbeddingIndex)
+        extended.ids = np.concatenate((self.ids, ids))
+        extended.norms = np.concatenate((self.norms, np.asarray(norms, dtype=np.float32)))
+        extended.matrix = _as_matrix(matrix)
+        extended.scales = None
+        if self.scales is not None:
+            extended.scales = np.concatenate((self.scales, np.asarray(scales, dtype=np.float32)))
+        extended._rows = rows
+        extended.live = live if superseded else None
+        extended.version = None
+        return extended
+
+    @classmethod
+    def from_dict(cls, embeddings, dtype='float32'):
+        """
+        Build an index from a ``{course_id: vector}`` dict (the pickle format),
+        storing the rows as ``dtype`` (see ``quantize``).
+        """
+        if not embeddings:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), np.empty(0))
+
+        ids = np.fromiter(embeddings.keys(), dtype=np.int64, count=len(embeddings))
+        matrix = np.vstack([np.asarray(v, dtype=np.float32) for v in embeddings.values()])
+        norms = np.linalg.norm(matrix, axis=1)
+        # Leave zero vectors as zeros instead of dividing by zero
+        safe = np.where(norms > 0, norms, 1.0).astype(np.float32)
+        matrix /= safe[:, None]
+        matrix, scales = quantize(matrix, dtype)
+        return cls(ids, matrix, norms, scales)
+
+    def __len__(self):
+        return len(self.ids) if self.live is None else int(self.live.sum())
+
+    def __contains__(self, course_id):
+        return course_id in self.rows
+
+    def rows_for(self, course_ids):
+        """Row numbers for the given course ids, skipping unknown ids."""
+        return np.array([self.rows[cid] for cid in course_ids if cid in self.rows], dtype=np.int64)
+
+    def dense(self, rows=slice(None)):
+        """Normalized float32 vectors of ``rows`` (decoded if stored quantized)."""
+        block = self.matrix[rows].astype(np.float32, copy=False)
+        if self.scales is not None:
+            block = block * self.scales[rows][..., None]
+        return block
+
+    def dot(self, other):
+        """
+        ``normalized matrix @ other`` for a query vector or a dim x m query
+        matrix, decoding quantized rows a block at a time.
+        """
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ other
+        out = np.empty((len(self.matrix),) + other.shape[1:], dtype=np.float32)
+        for start in range(0, len(self.matrix), self.SCORE_BLOCK):
+            stop = start + self.SCORE_BLOCK
+            out[start:stop] = self.matrix[start:stop].astype(np.float32) @ other
+        if self.scales is not None:
+            out *= self.scales.reshape((-1,) + (1,) * (out.ndim - 1))
+        return out
+
+    def vector(self, course_id):
+        """Original (un-normalized) vector for a course."""
+        row = self.rows[course_id]
+        return self.dense(row) * self.norms[row]
+
+    def profile_vector(self, course_ids):
+        """Average of the original vectors of the given courses, or None."""
+        rows = self.rows_for(course_ids)
+        if len(rows) == 0:
+            return None
+        return (self.dense(rows) * self.norms[rows, None]).mean(axis=0)
+
+    def candidate_mask(self, all_course_ids, exclude_ids):
+        """Boolean row mask: in ``all_course_ids`` and not in ``exclude_ids``."""
+        mask = np.isin(self.ids, np.fromiter(all_course_ids, dtype=np.int64))
+        if self.live is not None:
+            mask &= self.live
+        excluded = self.rows_for(exclude_ids)
+        if len(excluded):
+            mask[excluded] = False
+        return mask
+
+    def search(self, query, top_n, mask=None):
+        """
+        Top ``top_n`` course ids by cosine similarity to ``query``.
+
+        Args:
+            query: 1-D query vector (need not be normalized)
+            top_n: number of results
+            mask: optional boolean row mask of allowed candidates
+        Returns:
+            List of (course_id, similarity) sorted by similarity descending
+        """
+        if len(self.ids) == 0 or top_n <= 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        scores = self.dot(query / query_norm)
+
+        if mask is None:
+            mask = self.live
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            scores = scores[candidates]
+        else:
+            candidates = np.arange(len(scores))
+
+        if len(candidates) == 0:
+            return []
+
+        k = min(top_n, len(candidates))
+        if k < len(candidates):
+            top = np.sort(np.argpartition(-scores, k - 1)[:k])
+        else:
+            top = np.arange(len(candidates))
+        # Stable sort keeps the original candidate order among equal scores
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.ids[candidates[i]]), float(scores[i])) for i in top]
+
+    def search_batch(self, queries, top_n, mask=None, exclude=None):
+        """
+        Batched ``search``: scores all ``queries`` (an m x dim matrix) with one
+        matrix product.
+
+        Args:
+            queries: m x dim query matrix (rows need not be normalized)
+            top_n: number of results per query
+            mask: optional boolean row mask shared by all queries
+            exclude: optional list of m row arrays to drop for each query
+        Returns:
+            List of m result lists, as returned by ``search``
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if len(self.ids) == 0 or top_n <= 0:
+            return [[] for _ in range(len(queries))]
+
+        norms = np.linalg.norm(queries, axis=1)
+        unit = queries / np.where(norms > 0, norms, 1.0)[:, None]
+        if self.matrix.dtype == np.float32:
+            scores = unit @ self.matrix.T
+        else:
+            scores = np.ascontiguousarray(self.dot(unit.T).T)
+
+        if mask is None:
+            mask = self.live
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        if exclude is not None:
+            for i, rows in enumerate(exclude):
+                scores[i, rows] = -np.inf
+
+        k = min(top_n, scores.shape[1])
+        if k < scores.shape[1]:
+            top = np.sort(np.argpartition(-scores, k - 1, axis=1)[:, :k], axis=1)
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for i in range(len(queries)):
+            if norms[i] == 0:
+                results.append([])
+                continue
+            valid = np.isfinite(top_scores[i])
+            results.append([
+                (int(self.ids[row]), float(score))
+                for row, score in zip(top[i][valid], top_scores[i][valid])
+            ])
+        return results
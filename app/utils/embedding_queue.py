@@ -0,0 +1,203 @@
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from app.utils import embedding_service
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process may run the recovery
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def course_text(course):
+    """Text a course is embedded from."""
+    return f"{course.title}. {course.description}"
+
+
+@contextmanager
+def _try_lock(path):
+    """Exclusive lock on ``path`` without waiting: yields whether it was acquired."""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class EmbeddingQueue:
+    """
+    Background course-embedding pipeline.
+
+    Route handlers call ``enqueue(course_id)`` after committing a course with
+    ``embedding_pending=True`` and return straight away. A single worker
+    thread drains the queue, encodes up to ``EMBEDDING_BATCH_SIZE`` courses
+    per ``model.encode(batch)`` call, stores the vectors and clears the
+    pending flag.
+
+    Courses still pending from a previous run (a crash, or
+    ``import-catalog --no-embed``) are embedded by ``embed_pending()``, in
+    ``EMBEDDING_BATCH_SIZE`` batches: on a background thread after the
+    first request a web process serves, in only one process at a time
+    (a lock file in the instance folder), or by ``flask embed-pending``.
+
+    With ``EMBEDDING_ASYNC = False`` courses are embedded inline instead,
+    and nothing is recovered automatically (handy for scripts and tests).
+
+    Config:
+        EMBEDDING_ASYNC        embed on the background thread (default True)
+        EMBEDDING_BATCH_SIZE   courses per encode call (default 32)
+        EMBEDDING_RECOVER      embed leftover pending courses (default True)
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._recovery_started = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EMBEDDING_ASYNC', True)
+        app.config.setdefault('EMBEDDING_BATCH_SIZE', 32)
+        app.config.setdefault('EMBEDDING_RECOVER', True)
+        self.app = app
+        app.extensions['embedding_queue'] = self
+        # Serving requests means this is a web process (after any fork),
+        # not a CLI command or a script
+        app.before_request(self._start_recovery)
+
+    def enqueue(self, course_id):
+        if not self.app.config['EMBEDDING_ASYNC']:
+            with self.app.app_context():
+                self.process([course_id])
+            return
+        self._ensure_worker()
+        self._queue.put(course_id)
+
+    def join(self):
+        """Block until every queued course has been processed."""
+        self._queue.join()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='embedding-queue', daemon=True
+                )
+                self._thread.start()
+
+    def _start_recovery(self):
+        if self._recovery_started:
+            return
+        with self._lock:
+            if self._recovery_started:
+                return
+            self._recovery_started = True
+        config = self.app.config
+        if config['EMBEDDING_ASYNC'] and config['EMBEDDING_RECOVER']:
+            threading.Thread(target=self._recover, name='embedding-recovery', daemon=True).start()
+
+    def _recover(self):
+        lock_path = os.path.join(self.app.instance_path, 'embedding-recovery.lock')
+        with _try_lock(lock_path) as acquired:
+            if not acquired:
+                return  # Another worker is already on it
+            with self.app.app_context():
+                count = self.embed_pending()
+            if count:
+                logger.info("Embedded %d courses left pending by a previous run", count)
+
+    def embed_pending(self, batch_size=None, on_batch=None):
+        """
+        Embed every course still marked pending, ``batch_size`` (default
+        ``EMBEDDING_BATCH_SIZE``) per encode call. A batch that fails is
+        logged and stays pending. Needs an app context. Returns the number
+        of courses embedded; ``on_batch(total)`` is called after each batch.
+        """
+        from app import db
+        from app.models import Course
+
+        batch_size = batch_size or self.app.config['EMBEDDING_BATCH_SIZE']
+        embedded, after = 0, 0
+        while True:
+            batch = [course_id for (course_id,) in (
+                db.session.query(Course.id)
+                .filter(Course.embedding_pending == True, Course.id > after)
+                .order_by(Course.id)
+                .limit(batch_size)
+            )]
+            if not batch:
+                return embedded
+            after = batch[-1]
+            embedded += self._process_safely(batch)
+            if on_batch:
+                on_batch(embedded)
+
+    def _run(self):
+        batch_size = self.app.config['EMBEDDING_BATCH_SIZE']
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self.app.app_context():
+                self._process_safely(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _process_safely(self, course_ids):
+        try:
+            return self.process(course_ids)
+        except Exception:
+            # Courses stay pending for the next recovery
+            logger.exception("Embedding batch failed for courses %s", course_ids)
+            from app import db
+            db.session.rollback()
+            return 0
+
+    def process(self, course_ids):
+        """
+        Embed the given pending courses in one batch (needs an app context).
+        Returns how many were still pending and got embedded.
+        """
+        from app import db
+        from app.models import Course
+        from app.utils.recommendation import save_embeddings
+
+        courses = Course.query.filter(
+            Course.id.in_(set(course_ids)),
+            Course.embedding_pending == True
+        ).all()
+        if not courses:
+            return 0
+
+        vectors = embedding_service.encode([course_text(c) for c in courses])
+        save_embeddings({c.id: v for c, v in zip(courses, vectors)})
+
+        for course in courses:
+            course.embedding_pending = False
+        db.session.commit()
+        return len(courses)
+
+
+embedding_queue = EmbeddingQueue()
@@ -0,0 +1,97 @@
+import functools
+import os
+import threading
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Encoder implementation:
+#   EMBEDDING_BACKEND=torch   SentenceTransformer (default)
+#   EMBEDDING_BACKEND=onnx    int8-quantized ONNX export run with onnxruntime,
+#                             no torch needed; create it with `flask export-encoder`
+#   EMBEDDING_ONNX_PATH       export directory (default <repo>/all-MiniLM-L6-v2.onnx)
+#   EMBEDDING_THREADS         CPU threads per encode call (default: all cores)
+#   EMBEDDING_ENCODE_BATCH    texts per forward pass (default 32)
+BACKEND = os.environ.get('EMBEDDING_BACKEND', 'torch')
+ONNX_PATH = os.environ.get(
+    'EMBEDDING_ONNX_PATH',
+    os.path.join(os.path.dirname(__file__), '..', '..', f'{MODEL_NAME}.onnx')
+)
+THREADS = int(os.environ.get('EMBEDDING_THREADS', 0)) or None
+ENCODE_BATCH = int(os.environ.get('EMBEDDING_ENCODE_BATCH', 32))
+
+# Encoded search queries kept per process; popular queries repeat, and a
+# hit skips the model's forward pass entirely
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_EMBEDDING_CACHE_SIZE', 1024))
+
+# One model per process, loaded on first use
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Return the shared encoder (a SentenceTransformer, or an OnnxEncoder with
+    EMBEDDING_BACKEND=onnx), loading it on first call (thread-safe).
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = _load_model()
+    return _model
+
+
+def _load_model():
+    if BACKEND == 'onnx':
+        from app.utils.onnx_encoder import OnnxEncoder
+        return OnnxEncoder(ONNX_PATH, threads=THREADS, batch_size=ENCODE_BATCH)
+    if BACKEND != 'torch':
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {BACKEND!r} (expected torch or onnx)")
+
+    # Imported here so workers that never encode don't pay for torch
+    from sentence_transformers import SentenceTransformer
+    if THREADS:
+        import torch
+        torch.set_num_threads(THREADS)
+    return SentenceTransformer(MODEL_NAME)
+
+
+def is_loaded():
+    return _model is not None
+
+
+def preload():
+    """
+    Load the model eagerly. Call from gunicorn's ``post_fork`` hook (one copy
+    per worker) or at import with ``--preload`` (one copy shared by forked
+    workers) so the first request doesn't pay the load time.
+    """
+    get_model()
+
+
+def encode(texts, **kwargs):
+    """Encode one text or a list of texts with the shared model."""
+    kwargs.setdefault('batch_size', ENCODE_BATCH)
+    return get_model().encode(texts, **kwargs)
+
+
+def normalize_query(text):
+    """
+    Cache key for a search query. The model is uncased and ignores extra
+    whitespace, so "Fractions  " and "fractions" encode identically.
+    """
+    return ' '.join(text.lower().split())
+
+
+@functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _query_vector(text):
+    import numpy as np
+
+    vector = np.asarray(encode(text), dtype=np.float32)
+    vector.setflags(write=False)  # Shared by every caller that hits the cache
+    return vector
+
+
+def encode_query(text):
+    """Embedding of a search query, served from an LRU cache when possible."""
+    return _query_vector(normalize_query(text))
@@ -0,0 +1,321 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.utils.embedding_index import DTYPES, EmbeddingIndex, quantize
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
+# Per-row metadata, stored next to the vectors: course id and original L2 norm
+META_DTYPE = np.dtype([('id', '<i8'), ('norm', '<f4')])
+# int8 stores also keep each row's dequantization scale
+SCALED_META_DTYPE = np.dtype([('id', '<i8'), ('norm', '<f4'), ('scale', '<f4')])
+
+
+def _layout(manifest):
+    """(row dtype, metadata dtype) of a store; stores without a dtype are float32."""
+    dtype = manifest.get('dtype', 'float32')
+    return np.dtype(dtype), SCALED_META_DTYPE if dtype == 'int8' else META_DTYPE
+
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped course embedding storage.
+
+    Layout of ``path`` (a directory)::
+
+        manifest.json   {"dim": 384, "generation": 0, "dtype": "float32",
+                         "superseded": false}
+        <gen>.vec       raw rows, L2-normalized, row-major, encoded as dtype
+        <gen>.meta      one META_DTYPE record per row (SCALED_META_DTYPE for int8)
+        lock            cross-process write lock
+
+    Opening the store memory-maps the vector file, so every worker shares
+    the OS page cache instead of holding its own copy. New vectors are
+    appended (a re-embedded course gets a new row; the last row wins).
+    ``compact()`` drops superseded rows into a new generation and switches
+    to it by atomically replacing the manifest. The previous generation's
+    files are kept until the next compaction, so a reader that read the
+    old manifest can still open them.
+
+    Loading maps both files and reads nothing else: the manifest's
+    ``superseded`` flag says whether any course has more than one row, so
+    the duplicate scan only runs for stores that need it (and for stores
+    written before the flag existed).
+
+    ``dtype`` (float32, float16 or int8, see embedding_index.quantize) only
+    applies when the store is created; ``compact(dtype=...)`` (``flask
+    convert-embeddings``) converts an existing store.
+    """
+
+    # Compact automatically once this fraction of rows is superseded
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, path, dtype='float32'):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding dtype {dtype!r} (expected one of {', '.join(DTYPES)})")
+        self.path = path
+        self.dtype = dtype
+        self._lock = threading.Lock()
+
+    # -- paths -----------------------------------------------------------
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def manifest(self):
+        """Current manifest, or None if the store has not been created."""
+        try:
+            with open(self._file('manifest.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def exists(self):
+        return self.manifest() is not None
+
+    def _write_manifest(self, manifest):
+        tmp_path = self._file('manifest.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file('manifest.json'))
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._file('lock'), 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # -- reading ---------------------------------------------------------
+
+    def _row_count(self, manifest):
+        gen, dim = manifest['generation'], manifest['dim']
+        row_dtype, meta_dtype = _layout(manifest)
+        vec_rows = os.path.getsize(self._file(f'{gen}.vec')) // (row_dtype.itemsize * dim)
+        meta_rows = os.path.getsize(self._file(f'{gen}.meta')) // meta_dtype.itemsize
+        # A write interrupted between the two files leaves extra rows in one
+        return min(vec_rows, meta_rows)
+
+    def version(self):
+        """
+        ``(generation, row count)`` of the store, or None if missing. Cheap
+        (one small read and two stats) so it can be polled per request.
+        """
+        manifest = self.manifest()
+        if manifest is None:
+            return None
+        try:
+            return manifest['generation'], self._row_count(manifest)
+        except FileNotFoundError:
+            return None  # Compacted between reading the manifest and the files
+
+    # Attempts to open a generation a concurrent compaction replaced
+    OPEN_RETRIES = 3
+
+    def load_index(self):
+        """Memory-map the store as an EmbeddingIndex (empty if missing)."""
+        for attempt in range(self.OPEN_RETRIES):
+            manifest = self.manifest()
+            if manifest is None:
+                return EmbeddingIndex.from_dict({})
+            try:
+                return self._map_index(manifest)
+            except FileNotFoundError:
+                # Compacted (twice) since the manifest was read: read it again
+                if attempt == self.OPEN_RETRIES - 1:
+                    raise
+
+    def _map_index(self, manifest):
+        gen, dim = manifest['generation'], manifest['dim']
+        row_dtype, meta_dtype = _layout(manifest)
+        count = self._row_count(manifest)
+        if count == 0:
+            index = EmbeddingIndex.from_dict({})
+        else:
+            meta = np.memmap(self._file(f'{gen}.meta'), dtype=meta_dtype, mode='r', shape=(count,))
+            matrix = np.memmap(self._file(f'{gen}.vec'), dtype=row_dtype, mode='r', shape=(count, dim))
+            index = EmbeddingIndex(meta['id'], matrix, meta['norm'], _scales(meta),
+                                   superseded=manifest.get('superseded'))
+        index.version = (gen, count)
+        return index
+
+    def refresh(self, index):
+        """
+        Bring ``index`` up to date with the store. Returns ``index`` itself if
+        nothing changed, an extended index with only the new rows read if
+        rows were appended, or a freshly loaded index after a compaction.
+        If the store is being compacted too quickly to open, ``index`` is
+        returned unchanged and the next refresh tries again.
+        """
+        version = self.version()
+        if version is None or version == index.version:
+            return index
+
+        try:
+            gen, count = version
+            if index.version is None or index.version[0] != gen or count < index.version[1] or len(index.ids) == 0:
+                return self.load_index()
+
+            manifest = self.manifest()
+            if manifest is None or manifest['generation'] != gen:
+                return self.load_index()  # Compacted since version() read it
+            dim = manifest['dim']
+            row_dtype, meta_dtype = _layout(manifest)
+            start = index.version[1]
+            meta = np.fromfile(
+                self._file(f'{gen}.meta'), dtype=meta_dtype,
+                count=count - start, offset=start * meta_dtype.itemsize
+            )
+            matrix = np.memmap(self._file(f'{gen}.vec'), dtype=row_dtype, mode='r', shape=(count, dim))
+        except FileNotFoundError:
+            return index
+        extended = index.extend(meta['id'], meta['norm'], matrix, _scales(meta))
+        extended.version = version
+        return extended
+
+    # -- writing ---------------------------------------------------------
+
+    def initialize(self, embeddings):
+        """Create the store from ``{course_id: vector}`` unless it already exists."""
+        with self._write_lock():
+            if self.manifest() is None:
+                self._append(embeddings)
+
+    def append(self, embeddings):
+        """Append ``{course_id: vector}``; replaces earlier vectors of the same ids."""
+        with self._write_lock():
+            self._append(embeddings)
+
+    def _append(self, embeddings):
+        if not embeddings:
+            return
+
+        ids = np.fromiter(embeddings.keys(), dtype=np.int64, count=len(embeddings))
+        vectors = np.vstack([np.asarray(v, dtype=np.float32) for v in embeddings.values()])
+        norms = np.linalg.norm(vectors, axis=1)
+        vectors /= np.where(norms > 0, norms, 1.0)[:, None]
+
+        manifest = self.manifest()
+        if manifest is None:
+            manifest = {'dim': int(vectors.shape[1]), 'generation': 0, 'dtype': self.dtype,
+                        'superseded': False}
+            for ext in ('vec', 'meta'):
+                open(self._file(f'0.{ext}'), 'wb').close()
+            self._write_manifest(manifest)
+        if vectors.shape[1] != manifest['dim']:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match store ({manifest['dim']})"
+            )
+
+        gen, dim = manifest['generation'], manifest['dim']
+        row_dtype, meta_dtype = _layout(manifest)
+        vectors, scales = quantize(vectors, row_dtype.name)
+        meta = np.empty(len(ids), dtype=meta_dtype)
+        meta['id'] = ids
+        meta['norm'] = norms
+        if scales is not None:
+            meta['scale'] = scales
+
+        count = self._row_count(manifest)
+        existing_ids = np.fromfile(self._file(f'{gen}.meta'), dtype=meta_dtype, count=count)['id']
+        replaced = int(np.isin(ids, existing_ids).sum())
+        if replaced and not manifest.get('superseded'):
+            # Flag first, so no reader maps the duplicate rows without it
+            manifest = {**manifest, 'superseded': True}
+            self._write_manifest(manifest)
+
+        # Vectors first, then metadata: a row only exists once both are written
+        for ext, itemsize, data in (
+            ('vec', row_dtype.itemsize * dim, vectors),
+            ('meta', meta_dtype.itemsize, meta),
+        ):
+            with open(self._file(f'{gen}.{ext}'), 'r+b') as f:
+                f.truncate(count * itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(data.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        total = count + len(ids)
+        superseded = total - len(np.unique(np.concatenate((existing_ids, ids))))
+        if superseded and superseded >= self.COMPACT_RATIO * total:
+            self._compact(manifest)
+
+    def compact(self, dtype=None):
+        """
+        Rewrite the store without superseded rows (atomic generation switch),
+        re-encoding the rows as ``dtype`` if given. Converting to a wider
+        dtype does not restore precision already lost.
+        """
+        if dtype is not None and dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding dtype {dtype!r} (expected one of {', '.join(DTYPES)})")
+        with self._write_lock():
+            manifest = self.manifest()
+            if manifest is not None:
+                self._compact(manifest, dtype)
+
+    def _compact(self, manifest, dtype=None):
+        gen, dim = manifest['generation'], manifest['dim']
+        row_dtype, meta_dtype = _layout(manifest)
+        dtype = dtype or row_dtype.name
+        count = self._row_count(manifest)
+        if count == 0 and dtype == row_dtype.name:
+            return
+        meta = np.fromfile(self._file(f'{gen}.meta'), dtype=meta_dtype, count=count)
+        vectors = np.memmap(self._file(f'{gen}.vec'), dtype=row_dtype, mode='r', shape=(count, dim))
+
+        # Keep the last row of every id, in original order
+        _, last_from_end = np.unique(meta['id'][::-1], return_index=True)
+        keep = np.sort(count - 1 - last_from_end)
+        vectors, meta = vectors[keep], meta[keep]
+
+        new_gen = gen + 1
+        new_manifest = {'dim': dim, 'generation': new_gen, 'dtype': dtype, 'superseded': False}
+        if dtype != row_dtype.name:
+            decoded = vectors.astype(np.float32)
+            if 'scale' in meta.dtype.names:
+                decoded *= meta['scale'][:, None]
+            vectors, scales = quantize(decoded, dtype)
+            converted = np.empty(len(meta), dtype=_layout(new_manifest)[1])
+            converted['id'] = meta['id']
+            converted['norm'] = meta['norm']
+            if scales is not None:
+                converted['scale'] = scales
+            meta = converted
+
+        for ext, data in (('vec', vectors), ('meta', meta)):
+            with open(self._file(f'{new_gen}.{ext}'), 'wb') as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        del vectors
+
+        self._write_manifest(new_manifest)
+        # Keep generation ``gen`` for readers that read the manifest before
+        # this switch; remove the ones before it
+        for name in os.listdir(self.path):
+            stem, ext = os.path.splitext(name)
+            if ext in ('.vec', '.meta') and stem.isdigit() and int(stem) < gen:
+                try:
+                    os.remove(self._file(name))
+                except OSError:
+                    pass  # Still mapped by a reader on Windows; harmless leftover
+
+
+def _scales(meta):
+    return meta['scale'] if 'scale' in meta.dtype.names else None
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+
+MODEL_FILE = 'model.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+
+# all-MiniLM-L6-v2 truncates inputs to 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+
+class OnnxEncoder:
+    """
+    Sentence encoder running an exported copy of the model with onnxruntime.
+
+    Same pipeline as the SentenceTransformer model (tokenize, transformer,
+    mean pooling over real tokens, L2 normalize) but without torch: only
+    onnxruntime and the Rust ``tokenizers`` package are loaded. ``path`` is
+    a directory written by ``export``.
+
+    Texts are sorted by length and encoded ``batch_size`` at a time, each
+    batch padded only to its own longest text. ``threads`` caps
+    onnxruntime's intra-op thread pool (default: one per core).
+    """
+
+    def __init__(self, path, threads=None, batch_size=32):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(path, MODEL_FILE), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()  # To the longest text of each batch
+        self.batch_size = batch_size
+
+    def encode(self, texts, batch_size=None, **kwargs):
+        """
+        Same contract as SentenceTransformer.encode: a 1-D vector for one
+        text, an n x dim array for a list. Other keyword arguments are
+        accepted and ignored.
+        """
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        batch_size = batch_size or self.batch_size
+
+        # Longest first, so each batch holds texts of similar length
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        vectors = None
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            batch = self._encode_batch([texts[i] for i in rows])
+            if vectors is None:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[rows] = batch
+
+        if vectors is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': attention_mask,
+        }
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def export(model_name, path, quantize=True):
+    """
+    Export ``sentence-transformers/<model_name>`` to ``path``: the
+    transformer as ONNX (weights dynamically quantized to int8 unless
+    ``quantize`` is False) plus its tokenizer. Needs torch, transformers
+    and onnxruntime, but only here; serving needs onnxruntime and tokenizers.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(path, exist_ok=True)
+    hf_name = f'sentence-transformers/{model_name}'
+    tokenizer = AutoTokenizer.from_pretrained(hf_name)
+    model = AutoModel.from_pretrained(hf_name).eval()
+
+    names = ['input_ids', 'attention_mask', 'token_type_ids']
+    sample = tokenizer(['An example course description.'], return_tensors='pt')
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in names + ['token_embeddings']}
+    full_precision = os.path.join(path, 'model_fp32.onnx')
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), full_precision,
+            input_names=names, output_names=['token_embeddings'],
+            dynamic_axes=dynamic_axes, opset_version=14,
+        )
+
+    target = os.path.join(path, MODEL_FILE)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(full_precision, target, weight_type=QuantType.QInt8)
+        os.remove(full_precision)
+    else:
+        os.replace(full_precision, target)
+    tokenizer.backend_tokenizer.save(os.path.join(path, TOKENIZER_FILE))
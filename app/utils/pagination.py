@@ -0,0 +1,111 @@
+import base64
+import json
+
+from app import db
+
+
+def encode_cursor(values):
+    """Opaque URL-safe cursor for a row's sort-key values."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _python_type(column):
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _matches(value, column):
+    """Whether a decoded JSON value can be compared with ``column``."""
+    if value is None or isinstance(value, (bool, list, dict)):
+        return False
+    expected = _python_type(column)
+    if expected is None:
+        return isinstance(value, (int, float, str))
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor, columns):
+    """
+    Sort-key values for ``columns`` from a cursor, or None if missing or
+    malformed (wrong length or a value of the wrong type for its column).
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+    if not all(_matches(value, column) for value, column in zip(values, columns)):
+        return None
+    return values
+
+
+def _stream(query, batch_size):
+    """
+    Rows of ``query`` in ``yield_per`` batches, read through the session of
+    the current context. A query built in a view is tied to the request's
+    session, which is closed and discarded before a streamed response is
+    generated; iterating it there would check out a connection nothing
+    returns to the pool.
+    """
+    return query.with_session(db.session()).yield_per(batch_size)
+
+
+class KeysetPage:
+    """
+    One page of ``query`` ordered by ``columns``, starting after ``cursor``.
+
+    Iterating streams the rows in ``yield_per`` batches, so it can feed a
+    streamed template directly. ``next_cursor`` is set once iteration has
+    gone past the last row of the page (None if this is the last page).
+
+        page = KeysetPage(Course.query, [Course.class_level, Course.id], cursor, 24)
+        for course in page: ...
+        page.next_cursor
+    """
+
+    def __init__(self, query, columns, cursor=None, per_page=24, batch_size=100):
+        self.columns = columns
+        self.per_page = per_page
+        self.batch_size = batch_size
+        self.next_cursor = None
+
+        after = decode_cursor(cursor, columns)
+        if after is not None:
+            # Row-value comparison, served by a composite index on the columns
+            query = query.filter(db.tuple_(*columns) > db.tuple_(*after))
+        # One extra row tells whether there is a next page
+        self.query = query.order_by(*columns).limit(per_page + 1)
+
+    def __iter__(self):
+        last = None
+        for count, item in enumerate(_stream(self.query, self.batch_size)):
+            if count == self.per_page:
+                self.next_cursor = encode_cursor(getattr(last, c.key) for c in self.columns)
+                break
+            last = item
+            yield item
+
+
+class LimitedResults:
+    """
+    The first ``limit`` rows of an already-ordered query (e.g. ranked search
+    results), streamed in ``yield_per`` batches. Same interface as KeysetPage.
+    """
+
+    next_cursor = None
+
+    def __init__(self, query, limit, batch_size=100):
+        self.query = query.limit(limit)
+        self.batch_size = batch_size
+
+    def __iter__(self):
+        return iter(_stream(self.query, self.batch_size))
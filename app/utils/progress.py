@@ -0,0 +1,262 @@
+from app import db
+from app.models import CourseStats, Lesson, LessonProgress, Progress, Video, VideoProgress
+from app.utils import course_stats
+
+
+def _load(student_id, course_id):
+    """(Progress or None, (total_lessons, total_videos)) in one query."""
+    row = (
+        db.session.query(Progress, CourseStats)
+        .outerjoin(CourseStats, CourseStats.course_id == Progress.course_id)
+        .filter(Progress.student_id == student_id, Progress.course_id == course_id)
+        .first()
+    )
+    progress, stats = row if row else (None, None)
+    return progress, _totals(course_id, stats)
+
+
+def _totals(course_id, stats=None):
+    """(total_lessons, total_videos) of a course, from its CourseStats row."""
+    if stats is None:
+        stats = db.session.get(CourseStats, course_id)
+    if stats is None:
+        # No stats row yet (e.g. data loaded by an old script): count directly
+        return (
+            Lesson.query.filter_by(course_id=course_id).count(),
+            Video.query.filter_by(course_id=course_id).count(),
+        )
+    return stats.lesson_count, stats.video_count
+
+
+def _summary(progress, totals):
+    total_lessons, total_videos = totals
+    completed_lessons = progress.completed_lessons if progress else 0
+    completed_videos = progress.completed_videos if progress else 0
+    return {
+        'percent_complete': progress.percent_complete if progress else 0,
+        'completed_videos': completed_videos,
+        'total_videos': total_videos,
+        'completed_lessons': completed_lessons,
+        'total_lessons': total_lessons,
+        'completed_items': completed_lessons + completed_videos,
+        'total_items': total_lessons + total_videos,
+    }
+
+
+def _percent(completed_items, total_items):
+    return (completed_items / total_items) * 100 if total_items > 0 else 0
+
+
+def _record(student_id, course_id, lessons=0, videos=0):
+    """
+    Add newly completed items to the student's counters and recompute
+    percent. The row is updated in SQL (counter + n), so two completions
+    in the same course committed at once can't lose one another's count.
+    """
+    progress, totals = _load(student_id, course_id)
+    total_items = sum(totals)
+    if progress is None:
+        progress = Progress(student_id=student_id, course_id=course_id,
+                            completed_lessons=lessons, completed_videos=videos,
+                            percent_complete=_percent(lessons + videos, total_items))
+        db.session.add(progress)
+        old_percent = None
+    else:
+        added = Progress.completed_lessons + Progress.completed_videos + lessons + videos
+        db.session.execute(
+            db.update(Progress)
+            .where(Progress.id == progress.id)
+            # percent first: some engines (MySQL) read columns already SET to the left
+            .ordered_values(
+                (Progress.percent_complete, _percent_sql(db.literal(total_items), items=added)),
+                (Progress.completed_lessons, Progress.completed_lessons + lessons),
+                (Progress.completed_videos, Progress.completed_videos + videos),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        # Read back what the database made of it, other writers included
+        db.session.refresh(progress, ['percent_complete', 'completed_lessons', 'completed_videos'])
+        completed_before = progress.completed_lessons + progress.completed_videos - lessons - videos
+        old_percent = _percent(completed_before, total_items)
+
+    course_stats.bump(course_id, completion_count=course_stats.completion_delta(
+        old_percent, progress.percent_complete
+    ))
+    return _summary(progress, totals)
+
+
+def complete_lesson(student_id, lesson):
+    """
+    Mark a lesson completed for a student and update their course progress.
+    Returns ``(summary, newly_completed)`` where summary is as returned by
+    ``course_progress``. Caller commits.
+    """
+    lesson_progress = LessonProgress.query.filter_by(
+        student_id=student_id, lesson_id=lesson.id
+    ).first()
+    if lesson_progress and lesson_progress.completed:
+        return course_progress(student_id, lesson.course_id), False
+    if lesson_progress is None:
+        db.session.add(LessonProgress(student_id=student_id, lesson_id=lesson.id, completed=True))
+    else:
+        lesson_progress.completed = True
+    return _record(student_id, lesson.course_id, lessons=1), True
+
+
+def complete_video(student_id, video):
+    """Video counterpart of ``complete_lesson``. Caller commits."""
+    video_progress = VideoProgress.query.filter_by(
+        student_id=student_id, video_id=video.id
+    ).first()
+    if video_progress and video_progress.completed:
+        return course_progress(student_id, video.course_id), False
+    if video_progress is None:
+        db.session.add(VideoProgress(student_id=student_id, video_id=video.id, completed=True))
+    else:
+        video_progress.completed = True
+    return _record(student_id, video.course_id, videos=1), True
+
+
+def course_progress(student_id, course_id):
+    """
+    Current progress of a student in a course, as a dict with
+    ``percent_complete``, ``completed_/total_`` lessons, videos and items.
+    """
+    progress, totals = _load(student_id, course_id)
+    return _summary(progress, totals)
+
+
+def with_pending_videos(summary, count):
+    """
+    ``summary`` as it will be once ``count`` more videos are recorded (for
+    completions that are acknowledged but not yet written).
+    """
+    if not count:
+        return summary
+    summary = dict(summary)
+    summary['completed_videos'] += count
+    summary['completed_items'] += count
+    summary['percent_complete'] = _percent(summary['completed_items'], summary['total_items'])
+    return summary
+
+
+def _percent_sql(total_items, items=None):
+    """``_percent`` of a Progress row's counters (or ``items``), as a SQL expression."""
+    if items is None:
+        items = Progress.completed_lessons + Progress.completed_videos
+    return db.case((total_items > 0, db.cast(items, db.Float) / total_items * 100), else_=0.0)
+
+
+def rescore(course_ids, connection=None):
+    """
+    Recompute the percent of every student in ``course_ids`` from their
+    counters and the courses' current CourseStats totals, and recount the
+    courses' completions. Needed whenever a course gains or loses items.
+    Runs in the session's transaction, or on ``connection`` (caller
+    commits). Returns the ids of students whose completed state changed.
+    """
+    conn = connection if connection is not None else db.session
+    course_ids = list(course_ids)
+    in_courses = Progress.course_id.in_(course_ids)
+
+    def completed():
+        return set(conn.execute(
+            db.select(Progress.student_id, Progress.course_id)
+            .where(in_courses, Progress.percent_complete >= 100)
+        ))
+
+    before = completed()
+    total_items = (
+        db.select(CourseStats.lesson_count + CourseStats.video_count)
+        .where(CourseStats.course_id == Progress.course_id)
+        .scalar_subquery()
+    )
+    conn.execute(
+        db.update(Progress).where(in_courses).values(percent_complete=_percent_sql(total_items))
+        .execution_options(synchronize_session='fetch')
+    )
+    conn.execute(
+        db.update(CourseStats).where(CourseStats.course_id.in_(course_ids)).values(
+            completion_count=db.select(db.func.count())
+            .where(Progress.course_id == CourseStats.course_id, Progress.percent_complete >= 100)
+            .scalar_subquery()
+        ).execution_options(synchronize_session='fetch')
+    )
+    return {student_id for student_id, _ in before ^ completed()}
+
+
+def items_changed(course_id, lessons=0, videos=0):
+    """
+    Add ``lessons`` / ``videos`` (negative when deleted) to a course's
+    totals and rescore its students. Returns the ids of students whose
+    completed state changed. Caller commits.
+    """
+    course_stats.bump(course_id, lesson_count=lessons, video_count=videos)
+    return rescore([course_id])
+
+
+def forget_video(video):
+    """
+    Take a video that is about to be deleted out of the course: out of the
+    completed-video counters of every student who finished it, and out of
+    the course's total (see ``items_changed``; finishing the rest may now
+    mean 100%). Returns the ids of students whose completed state changed.
+    Caller deletes the video and its VideoProgress rows and commits.
+    """
+    finished_by = db.session.query(VideoProgress.student_id).filter_by(
+        video_id=video.id, completed=True
+    )
+    db.session.execute(
+        db.update(Progress)
+        .where(Progress.course_id == video.course_id, Progress.student_id.in_(finished_by))
+        .values(completed_videos=db.case(
+            (Progress.completed_videos > 0, Progress.completed_videos - 1), else_=0
+        ))
+        .execution_options(synchronize_session='fetch')
+    )
+    return items_changed(video.course_id, videos=-1)
+
+
+def recompute(course_id=None):
+    """
+    Repair path: rebuild every student's completed-item counters from
+    LessonProgress / VideoProgress and their percent from those counters and
+    the course's current totals, optionally for one course. Commits.
+    Returns the number of progress rows updated. CourseStats completion
+    counts are not touched (``course_stats.rebuild()`` recounts them).
+    """
+    def completed_by_student(model, item, item_id):
+        query = (
+            db.session.query(model.student_id, item.course_id, db.func.count())
+            .join(item, item.id == item_id)
+            .filter(model.completed == True)
+        )
+        if course_id is not None:
+            query = query.filter(item.course_id == course_id)
+        return {(s, c): n for s, c, n in query.group_by(model.student_id, item.course_id)}
+
+    lessons = completed_by_student(LessonProgress, Lesson, LessonProgress.lesson_id)
+    videos = completed_by_student(VideoProgress, Video, VideoProgress.video_id)
+    totals = {cid: (lesson_count, video_count) for cid, lesson_count, video_count in
+              db.session.query(CourseStats.course_id, CourseStats.lesson_count, CourseStats.video_count)}
+
+    rows = Progress.query
+    if course_id is not None:
+        rows = rows.filter_by(course_id=course_id)
+
+    updated = 0
+    for progress in rows:
+        key = (progress.student_id, progress.course_id)
+        completed_lessons, completed_videos = lessons.get(key, 0), videos.get(key, 0)
+        if progress.course_id not in totals:
+            totals[progress.course_id] = _totals(progress.course_id)  # Counts directly
+        percent = _percent(completed_lessons + completed_videos, sum(totals[progress.course_id]))
+        current = (progress.completed_lessons, progress.completed_videos, progress.percent_complete)
+        if current == (completed_lessons, completed_videos, percent):
+            continue
+        progress.completed_lessons = completed_lessons
+        progress.completed_videos = completed_videos
+        progress.percent_complete = percent
+        updated += 1
+    db.session.commit()
+    return updated
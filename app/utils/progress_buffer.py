@@ -0,0 +1,205 @@
+import atexit
+import logging
+import threading
+
+from sqlalchemy.exc import IntegrityError
+
+from app.utils import progress as progress_service
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer:
+    """
+    Optional write coalescing for video completions.
+
+    With ``PROGRESS_BUFFER = True`` the AJAX ``complete_video`` endpoint
+    hands events to ``complete_video()``, which answers at once with the
+    progress the student will have, and a background thread writes the
+    buffered events in one transaction every ``PROGRESS_BUFFER_INTERVAL_MS``
+    or as soon as ``PROGRESS_BUFFER_MAX_EVENTS`` are waiting. A class
+    pressing "complete" together then costs one write lock, not one each.
+
+    Events are idempotent: a video already completed or already buffered
+    is not counted twice, and a batch that hits the unique constraints
+    (another process wrote the same completion) is replayed one event per
+    transaction, skipping the duplicates. The buffer is flushed on
+    ``close()``, which runs at interpreter exit.
+
+    The lock only guards the in-memory maps; no query runs under it. A
+    flush swaps the pending events out and keeps them "in flight" until
+    its commit, so summaries count them exactly once throughout.
+
+    Config:
+        PROGRESS_BUFFER               enable buffering (default False)
+        PROGRESS_BUFFER_INTERVAL_MS   max delay before a write (default 200)
+        PROGRESS_BUFFER_MAX_EVENTS    flush early at this many events (default 100)
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        # (student_id, video_id) -> course_id, waiting to be written
+        self._pending = {}
+        # The same, for the batch a flush is writing right now
+        self._in_flight = {}
+        # Bumped when a flush commits: a summary read from the database
+        # while it changed may count the batch twice, and is read again
+        self._commits = 0
+        # Guards the maps and the counter; never held during a query
+        self._lock = threading.Lock()
+        # One flush at a time (the worker thread and close())
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROGRESS_BUFFER', False)
+        app.config.setdefault('PROGRESS_BUFFER_INTERVAL_MS', 200)
+        app.config.setdefault('PROGRESS_BUFFER_MAX_EVENTS', 100)
+        self.app = app
+        app.extensions['progress_buffer'] = self
+        if app.config['PROGRESS_BUFFER']:
+            atexit.register(self.close)
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['PROGRESS_BUFFER']
+
+    def complete_video(self, student_id, video):
+        """
+        Buffer a video completion. Returns ``(summary, newly_completed)``
+        like ``progress.complete_video``, with the event already counted.
+        """
+        from app.models import VideoProgress
+
+        key = (student_id, video.id)
+        while True:
+            with self._lock:
+                commits = self._commits
+                buffered = key in self._pending or key in self._in_flight
+            done = buffered or VideoProgress.query.filter_by(
+                student_id=student_id, video_id=video.id, completed=True
+            ).first() is not None
+            with self._lock:
+                if self._commits != commits:
+                    continue  # A flush committed meanwhile: check again
+                newly_completed = not done and key not in self._pending
+                if newly_completed:
+                    self._pending[key] = video.course_id
+                full = len(self._pending) >= self.app.config['PROGRESS_BUFFER_MAX_EVENTS']
+                break
+
+        if newly_completed:
+            self._ensure_worker()
+            if full:
+                self._wake.set()
+        return self._summary(student_id, video.course_id), newly_completed
+
+    def course_progress(self, student_id, course_id):
+        """``progress.course_progress`` including buffered completions."""
+        if not self._pending and not self._in_flight:
+            return progress_service.course_progress(student_id, course_id)
+        return self._summary(student_id, course_id)
+
+    def _buffered(self, student_id, course_id):
+        return sum(
+            1 for events in (self._pending, self._in_flight)
+            for (pending_student, _), pending_course in events.items()
+            if pending_student == student_id and pending_course == course_id
+        )
+
+    def _summary(self, student_id, course_id):
+        while True:
+            with self._lock:
+                commits = self._commits
+                buffered = self._buffered(student_id, course_id)
+            summary = progress_service.course_progress(student_id, course_id)
+            with self._lock:
+                if self._commits == commits:
+                    return progress_service.with_pending_videos(summary, buffered)
+
+    def flush(self):
+        """Write every buffered event now. Returns the number of events written."""
+        from app import db
+        from app.utils.recommendation_cache import recommendation_cache
+
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._in_flight, self._pending = self._pending, {}
+                events = list(self._in_flight)
+
+            with self.app.app_context():
+                try:
+                    self._write(events)
+                except IntegrityError:
+                    db.session.rollback()
+                    for event in events:
+                        try:
+                            self._write([event])
+                        except IntegrityError:
+                            db.session.rollback()  # Already written elsewhere
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Writing %d buffered progress events failed", len(events))
+                    with self._lock:
+                        # Kept for the next flush
+                        self._pending = {**self._in_flight, **self._pending}
+                        self._in_flight = {}
+                    return 0
+
+                with self._lock:
+                    self._in_flight = {}
+                    self._commits += 1
+                for student_id in {student_id for student_id, _ in events}:
+                    recommendation_cache.invalidate(student_id)
+        return len(events)
+
+    def _write(self, events):
+        from app import db
+        from app.models import Video
+
+        video_ids = {video_id for _, video_id in events}
+        videos = {v.id: v for v in Video.query.filter(Video.id.in_(video_ids))}
+        for student_id, video_id in events:
+            video = videos.get(video_id)
+            if video is not None:  # Deleted since it was watched
+                progress_service.complete_video(student_id, video)
+        db.session.commit()
+
+    def close(self):
+        """Stop the background writer and flush what is left."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.app is not None:
+            self.flush()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if not self._closed and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(
+                    target=self._run, name='progress-buffer', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        interval = self.app.config['PROGRESS_BUFFER_INTERVAL_MS'] / 1000
+        while not self._closed:
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Progress buffer flush failed")
+
+
+progress_buffer = ProgressBuffer()
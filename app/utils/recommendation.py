@@ -1,17 +1,159 @@
+import logging
 import pickle
-import numpy as np
-from sentence_transformers import SentenceTransformer
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import threading
+import time
+from collections import namedtuple
+from app.utils.embedding_store import EmbeddingStore
+from app.utils.ann_index import IVFIndex
+import numpy as np
 
-# Load model once
-model = SentenceTransformer("all-MiniLM-L6-v2")
+logger = logging.getLogger(__name__)
 
-# Load precomputed embeddings once (with error handling)
-embeddings = {}
+# Course vectors live in a memory-mapped store shared by all workers.
+# The legacy pickle is only read once, to seed a store that doesn't exist yet.
+#   RECOMMENDER_DTYPE   row encoding of a new store: float32 (default),
+#                       float16 or int8 (see benchmarks/quantization.py for
+#                       the recall cost); an existing store keeps its own,
+#                       `flask convert-embeddings` converts it
 embeddings_file = os.path.join(os.path.dirname(__file__), '..', '..', 'course_embeddings.pkl')
-if os.path.exists(embeddings_file):
-    with open(embeddings_file, "rb") as f:
-        embeddings = pickle.load(f)
+
+# Opened on first use, not at import, so create_app() and CLI commands
+# that never recommend don't touch the store (see get_store)
+store = None
+
+# Optional approximate search for large catalogs:
+#   RECOMMENDER_BACKEND=ivf   use the IVF index instead of the exact scan
+#   RECOMMENDER_IVF_LISTS     number of k-means partitions (default sqrt(n))
+#   RECOMMENDER_IVF_PROBE     partitions scanned per query (higher = better recall)
+backend = os.environ.get('RECOMMENDER_BACKEND', 'exact')
+ann_file = os.path.splitext(embeddings_file)[0] + '.ivf.npz'
+
+# Seconds between checks of the store for courses added by other workers
+RELOAD_INTERVAL = float(os.environ.get('RECOMMENDER_RELOAD_INTERVAL', 2.0))
+
+# Everything a request scores against. Replaced as a whole on reload, so a
+# request that read ``_snapshot`` once always sees a consistent pair.
+Snapshot = namedtuple('Snapshot', 'index ann_index checked_at')
+
+
+def _build_ann(index):
+    if backend != 'ivf' or len(index) == 0:
+        return None
+    n_lists = os.environ.get('RECOMMENDER_IVF_LISTS')
+    return IVFIndex.load_or_build(
+        ann_file,
+        index,
+        n_lists=int(n_lists) if n_lists else None,
+        n_probe=int(os.environ.get('RECOMMENDER_IVF_PROBE', 8))
+    )
+
+
+# Normalized matrix for fast scoring (memory-mapped, so loading is O(1)),
+# built by the first current_snapshot() call
+_snapshot = None
+_reload_lock = threading.Lock()
+
+
+def get_store():
+    """The embedding store, opened (and seeded if needed) on first call."""
+    global store
+    if store is None:
+        with _reload_lock:
+            if store is None:
+                store = _open_store()
+    return store
+
+
+def _open_store():
+    opened = EmbeddingStore(
+        os.path.splitext(embeddings_file)[0] + '.store',
+        dtype=os.environ.get('RECOMMENDER_DTYPE', 'float32')
+    )
+    if not opened.exists() and os.path.exists(embeddings_file):
+        with open(embeddings_file, "rb") as f:
+            opened.initialize(pickle.load(f))
+    manifest = opened.manifest()
+    stored = manifest.get('dtype', 'float32') if manifest else opened.dtype
+    if stored != opened.dtype:
+        # The store is shared by every worker: never rewrite it on startup
+        logger.warning("Embedding store is %s but RECOMMENDER_DTYPE is %s; using %s "
+                       "(run 'flask convert-embeddings --dtype %s' to convert it)",
+                       stored, opened.dtype, stored, opened.dtype)
+        opened.dtype = stored
+    return opened
+
+
+def _load_snapshot():
+    global _snapshot
+    embedding_store = get_store()
+    with _reload_lock:
+        if _snapshot is None:
+            index = embedding_store.load_index()
+            _snapshot = Snapshot(index, _build_ann(index), time.monotonic())
+    return _snapshot
+
+
+def current_snapshot():
+    """
+    The latest index snapshot. At most every RELOAD_INTERVAL seconds one
+    caller checks the store and swaps in a snapshot with any new rows;
+    everyone else keeps using the current one without waiting.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None:
+        return _load_snapshot()
+    now = time.monotonic()
+    if now - snapshot.checked_at < RELOAD_INTERVAL:
+        return snapshot
+    if not _reload_lock.acquire(blocking=False):
+        return snapshot  # Another thread is already reloading
+
+    try:
+        index = store.refresh(snapshot.index)
+        ann_index = snapshot.ann_index
+        if index is not snapshot.index:
+            same_generation = (
+                snapshot.index.version is not None
+                and index.version[0] == snapshot.index.version[0]
+                and len(snapshot.index.ids) > 0
+            )
+            if ann_index is not None and same_generation:
+                ann_index = ann_index.extend(index)
+            else:
+                ann_index = _build_ann(index)
+        _snapshot = Snapshot(index, ann_index, now)
+    finally:
+        _reload_lock.release()
+    return _snapshot
+
+
+def index_version():
+    """Version of the index recommendations are currently scored against."""
+    return current_snapshot().index.version
+
+
+def use_store(new_store):
+    """
+    Score against ``new_store`` (an EmbeddingStore) from now on. For
+    benchmarks and scripts that bring their own catalog.
+    """
+    global store, _snapshot
+    store = new_store
+    index = new_store.load_index()
+    _snapshot = Snapshot(index, _build_ann(index), time.monotonic())
+
+
+def save_embeddings(new_embeddings):
+    """Append ``{course_id: vector}`` to the embedding store."""
+    global _snapshot
+    get_store().append(new_embeddings)
+    # Make this worker pick up its own write on the next request
+    if _snapshot is not None:
+        _snapshot = _snapshot._replace(checked_at=float('-inf'))
 
 def recommend_courses(completed_ids, all_course_ids, top_n=5):
     """
@@ -22,28 +164,110 @@ def recommend_courses(completed_ids, all_course_ids, top_n=5):
     Returns:
         List of course IDs sorted by similarity
     """
+    snapshot = current_snapshot()
+    index = snapshot.index
+
     # Check if embeddings exist
-    if not embeddings:
+    if len(index) == 0:
         return []  # No embeddings available yet
-        
+
     # Compute the average embedding of completed courses
-    completed_vectors = [embeddings[cid] for cid in completed_ids if cid in embeddings]
-    if not completed_vectors:
+    avg_vector = index.profile_vector(completed_ids)
+    if avg_vector is None:
         return []  # no completed embeddings
-    
-    avg_vector = np.mean(completed_vectors, axis=0)
-    
-    # Compute similarity to all candidates not in completed
-    candidates = [cid for cid in all_course_ids if cid not in completed_ids]
-    sims = []
-    for cid in candidates:
-        if cid in embeddings:  # Added safety check
-            v = embeddings[cid]
-            sim = np.dot(avg_vector, v) / (np.linalg.norm(avg_vector) * np.linalg.norm(v))
-            sims.append((cid, sim))
-    
-    # Sort by similarity descending
-    sims.sort(key=lambda x: x[1], reverse=True)
-    
-    top = [cid for cid, _ in sims[:top_n]]
-    return top
+
+    # Score every candidate not in completed with one matrix-vector product
+    mask = index.candidate_mask(all_course_ids, completed_ids)
+    searcher = snapshot.ann_index or index
+    top = searcher.search(avg_vector, top_n, mask=mask)
+    return [cid for cid, _ in top]
+
+
+def semantic_search(query_vector, course_ids=None, top_n=10):
+    """
+    Args:
+        query_vector: embedding of a search query (see embedding_service.encode_query)
+        course_ids: optional candidate course IDs (e.g. one class level)
+        top_n: how many results to return
+    Returns:
+        List of (course_id, similarity) sorted by similarity descending
+    """
+    snapshot = current_snapshot()
+    index = snapshot.index
+    if len(index) == 0:
+        return []
+
+    mask = index.candidate_mask(course_ids, []) if course_ids is not None else None
+    searcher = snapshot.ann_index or index
+    return searcher.search(query_vector, top_n, mask=mask)
+
+
+def _recommend_chunk(chunk, all_course_ids, top_n):
+    """Score one chunk of ``(student_id, completed_ids)`` pairs with one GEMM."""
+    index = current_snapshot().index
+    if len(index) == 0:
+        return [(student_id, []) for student_id, _ in chunk]
+
+    mask = None
+    if all_course_ids is not None:
+        mask = index.candidate_mask(all_course_ids, [])
+    elif index.live is not None:
+        mask = index.live
+
+    # Students without any embedded completed course get no recommendations
+    results = {}
+    scored, queries, exclude = [], [], []
+    for student_id, completed_ids in chunk:
+        vector = index.profile_vector(completed_ids)
+        if vector is None:
+            results[student_id] = []
+            continue
+        scored.append(student_id)
+        queries.append(vector)
+        exclude.append(index.rows_for(completed_ids))
+
+    if scored:
+        top = index.search_batch(np.vstack(queries), top_n, mask=mask, exclude=exclude)
+        for student_id, ranked in zip(scored, top):
+            results[student_id] = [cid for cid, _ in ranked]
+    return [(student_id, results[student_id]) for student_id, _ in chunk]
+
+
+def _chunks(profiles, size):
+    profiles = iter(profiles.items() if isinstance(profiles, dict) else profiles)
+    while True:
+        chunk = list(islice(profiles, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def recommend_courses_batch(profiles, top_n=5, all_course_ids=None, chunk_size=1024, processes=None):
+    """
+    Recommendations for many students at once, using the exact scorer.
+
+    Args:
+        profiles: dict or iterable of (student_id, completed_ids)
+        top_n: how many recommendations per student
+        all_course_ids: candidate course IDs (default: every embedded course)
+        chunk_size: students scored per matrix product; bounds memory to
+            about chunk_size x catalog float32 scores
+        processes: spread chunks over this many worker processes
+    Yields:
+        (student_id, [course ids sorted by similarity]) in input order
+    """
+    chunks = _chunks(profiles, chunk_size)
+    if not processes or processes <= 1:
+        for chunk in chunks:
+            yield from _recommend_chunk(chunk, all_course_ids, top_n)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # Keep a bounded number of chunks in flight so input is streamed too
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(_recommend_chunk, chunk, all_course_ids, top_n))
+            if len(pending) >= processes * 2:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
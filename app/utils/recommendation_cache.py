@@ -0,0 +1,214 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+
+class MemoryBackend:
+    """In-process LRU with TTL. Fast, but each worker has its own copy."""
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, student_id):
+        return self._versions.get(student_id, 0)
+
+    def bump_version(self, student_id):
+        with self._lock:
+            self._versions[student_id] = self._versions.get(student_id, 0) + 1
+
+
+class SQLiteBackend:
+    """
+    Cache in a local SQLite file, shared by every worker on the host, so a
+    hit (or an invalidation) in one worker is seen by all of them.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=300):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        # Closed straight away: create_app() may run before gunicorn forks
+        # its workers (preload_app), which must not share a connection
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rec_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_rec_cache_expires ON rec_cache (expires)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rec_version ('
+                'student_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)'
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _conn(self):
+        """This thread's connection, opened by this process (not inherited across a fork)."""
+        pid, conn = getattr(self._local, 'conn', (None, None))
+        if pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = (os.getpid(), conn)
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT value FROM rec_cache WHERE key = ? AND expires >= ?', (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO rec_cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, json.dumps(value), time.time() + self.ttl)
+        )
+        # Prune now and then rather than on every write
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute('DELETE FROM rec_cache WHERE expires < ?', (time.time(),))
+            conn.execute(
+                'DELETE FROM rec_cache WHERE key IN ('
+                'SELECT key FROM rec_cache ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def get_version(self, student_id):
+        row = self._conn().execute(
+            'SELECT version FROM rec_version WHERE student_id = ?', (student_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, student_id):
+        self._conn().execute(
+            'INSERT INTO rec_version (student_id, version) VALUES (?, 1) '
+            'ON CONFLICT(student_id) DO UPDATE SET version = version + 1',
+            (student_id,)
+        )
+
+
+def default_backend():
+    """
+    'sqlite' when several worker processes serve the app (WEB_CONCURRENCY,
+    which gunicorn.conf.py also sets from ``-w``), else 'memory'.
+    """
+    kind = os.environ.get('RECOMMENDATION_CACHE')
+    if kind:
+        return kind
+    try:
+        workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    except ValueError:
+        workers = 1
+    return 'sqlite' if workers > 1 else 'memory'
+
+
+class RecommendationCache:
+    """
+    Caches each student's recommended course ids.
+
+    Entries are keyed by student, the student's completed-set version and
+    the embedding index version. Routes that change a student's completed
+    courses call ``invalidate(student_id)``, which bumps the version so old
+    entries are never read again (they age out by TTL / LRU).
+
+    The version counters live in the backend. The 'sqlite' backend shares
+    them between processes, so an invalidation in one worker is seen by
+    all of them. The 'memory' backend keeps them per process: another
+    worker can serve a stale entry until its TTL runs out, which is why
+    that backend's default TTL is short and it is only the default for a
+    single process.
+
+    Config:
+        RECOMMENDATION_CACHE        'memory', 'sqlite' or 'none'; default
+                                    (env RECOMMENDATION_CACHE) is 'sqlite'
+                                    when WEB_CONCURRENCY > 1, else 'memory'
+        RECOMMENDATION_CACHE_PATH   SQLite file for the 'sqlite' backend
+        RECOMMENDATION_CACHE_SIZE   max entries (default 10000)
+        RECOMMENDATION_CACHE_TTL    seconds (default 300; 30 for 'memory')
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RECOMMENDATION_CACHE', default_backend())
+        app.config.setdefault('RECOMMENDATION_CACHE_SIZE', 10000)
+        app.config.setdefault(
+            'RECOMMENDATION_CACHE_TTL', 30 if app.config['RECOMMENDATION_CACHE'] == 'memory' else 300
+        )
+        app.config.setdefault(
+            'RECOMMENDATION_CACHE_PATH',
+            os.path.join(app.instance_path, 'recommendation_cache.db')
+        )
+
+        kind = app.config['RECOMMENDATION_CACHE']
+        size = app.config['RECOMMENDATION_CACHE_SIZE']
+        ttl = app.config['RECOMMENDATION_CACHE_TTL']
+        if kind == 'memory':
+            self.backend = MemoryBackend(max_entries=size, ttl=ttl)
+        elif kind == 'sqlite':
+            path = app.config['RECOMMENDATION_CACHE_PATH']
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteBackend(path, max_entries=size, ttl=ttl)
+        elif kind == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown RECOMMENDATION_CACHE backend: {kind}")
+        app.extensions['recommendation_cache'] = self
+
+    def _key(self, student_id, index_version, top_n):
+        version = self.backend.get_version(student_id)
+        return f"{student_id}:{version}:{index_version}:{top_n}"
+
+    def get_or_compute(self, student_id, index_version, top_n, compute):
+        """Cached recommendations for a student, calling ``compute()`` on a miss."""
+        if self.backend is None:
+            return compute()
+        key = self._key(student_id, index_version, top_n)
+        value = self.backend.get(key)
+        if value is None:
+            value = compute()
+            self.backend.set(key, value)
+        return value
+
+    def invalidate(self, student_id):
+        """Forget a student's cached recommendations (their progress changed)."""
+        if self.backend is not None:
+            self.backend.bump_version(student_id)
+
+
+recommendation_cache = RecommendationCache()
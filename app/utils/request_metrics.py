@@ -0,0 +1,181 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+slow_log = logging.getLogger('edulink.slow_requests')
+
+# Upper bounds of the histogram buckets (Prometheus "le" labels)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Longest statement text kept for the slow log
+MAX_STATEMENT_LENGTH = 1000
+
+
+class Histogram:
+    """Cumulative bucket counts, a sum and a count for each label set."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """
+    Per-request SQL and latency instrumentation.
+
+    Cursor events on every engine add each statement's time to the current
+    request: its query count, total DB time and slowest statement. Once the
+    response body has been sent (the WSGI server closes the response) the
+    numbers go into per-endpoint histograms, served in Prometheus text
+    format at ``METRICS_PATH``, and a request slower than
+    ``SLOW_REQUEST_MS`` is written to the ``edulink.slow_requests`` logger
+    as one JSON object.
+
+    The work per statement is two clock reads and a few additions, so it
+    is meant to stay on in production. Histograms are per process: with
+    several gunicorn workers, Prometheus should scrape each one (or the
+    numbers be read as a per-worker sample). Statements run outside a
+    request (the embedding queue, the progress buffer) are not counted.
+    The endpoint has no authentication; keep it off the public side of the
+    reverse proxy.
+
+    Config:
+        METRICS            enable instrumentation and the endpoint (default True)
+        METRICS_PATH       URL of the metrics endpoint (default /metrics)
+        SLOW_REQUEST_MS    slow-log threshold in milliseconds (default 500)
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.durations = Histogram(
+            'edulink_request_duration_seconds', 'Request latency by endpoint.', DURATION_BUCKETS
+        )
+        self.db_time = Histogram(
+            'edulink_request_db_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS
+        )
+        self.queries = Histogram(
+            'edulink_request_queries', 'SQL statements per request.', QUERY_BUCKETS
+        )
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Install the hooks. Call after ``db.init_app`` so the engines exist."""
+        from app import db
+
+        app.config.setdefault('METRICS', True)
+        app.config.setdefault('METRICS_PATH', '/metrics')
+        app.config.setdefault('SLOW_REQUEST_MS', 500)
+        app.extensions['request_metrics'] = self
+        if not app.config['METRICS']:
+            return
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+        app.before_request(_start_request)
+        app.after_request(self._after_request)
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.metrics_view)
+
+    def _after_request(self, response):
+        stats = g.get('request_stats')
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'  # Don't label by raw 404 paths
+        context = (endpoint, request.method, request.path, response.status_code,
+                   current_app.config['SLOW_REQUEST_MS'])
+        # Recorded once the body is sent, so a stream_template page includes
+        # the queries it runs while streaming
+        response.call_on_close(lambda: self._record(stats, *context))
+        return response
+
+    def _record(self, stats, endpoint, method, path, status, slow_ms):
+        duration = time.perf_counter() - stats['start']
+        labels = (endpoint, method, str(status))
+        with self._lock:
+            self.durations.observe(labels, duration)
+            self.db_time.observe(labels, stats['db_time'])
+            self.queries.observe(labels, stats['queries'])
+
+        if duration * 1000 >= slow_ms:
+            slow_log.warning(json.dumps({
+                'endpoint': endpoint,
+                'method': method,
+                'path': path,
+                'status': status,
+                'duration_ms': round(duration * 1000, 2),
+                'db_ms': round(stats['db_time'] * 1000, 2),
+                'queries': stats['queries'],
+                'slowest_ms': round(stats['slowest_time'] * 1000, 2),
+                'slowest_statement': (stats['slowest'] or '')[:MAX_STATEMENT_LENGTH],
+            }))
+
+    def metrics_view(self):
+        label_names = ('endpoint', 'method', 'status')
+        with self._lock:
+            lines = (
+                self.durations.render(label_names)
+                + self.db_time.render(label_names)
+                + self.queries.render(label_names)
+            )
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def _start_request():
+    g.request_stats = {'start': time.perf_counter(), 'queries': 0, 'db_time': 0.0,
+                       'slowest': None, 'slowest_time': 0.0}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start']
+    if not has_request_context():
+        return
+    stats = g.get('request_stats')
+    if stats is None:
+        return
+    stats['queries'] += 1
+    stats['db_time'] += elapsed
+    if elapsed > stats['slowest_time']:
+        stats['slowest_time'] = elapsed
+        stats['slowest'] = statement
+
+
+request_metrics = RequestMetrics()
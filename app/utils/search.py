@@ -0,0 +1,152 @@
+import re
+
+from sqlalchemy import event, text
+
+from app import db
+from app.models import Course
+
+# One FTS5 row per course (rowid = course.id): title, description and the
+# concatenated titles/contents of its lessons. Triggers keep it in sync, so
+# every write path (routes, seed scripts, bulk loads) is covered.
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS course_search USING fts5(
+        title, description, lessons, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS course_search_ai AFTER INSERT ON course BEGIN
+        INSERT INTO course_search (rowid, title, description, lessons)
+        VALUES (new.id, new.title, new.description, '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS course_search_au AFTER UPDATE OF title, description ON course BEGIN
+        UPDATE course_search SET title = new.title, description = new.description
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS course_search_ad AFTER DELETE ON course BEGIN
+        DELETE FROM course_search WHERE rowid = old.id;
+    END
+    """,
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS course_search_lesson_{name} AFTER {event_} ON lesson BEGIN
+        UPDATE course_search SET lessons = (
+            SELECT coalesce(group_concat(title || ' ' || content, ' '), '')
+            FROM lesson WHERE course_id = {row}.course_id
+        ) WHERE rowid = {row}.course_id;
+    END
+    """
+    for name, event_, row in (
+        ('ai', 'INSERT', 'new'),
+        ('au', 'UPDATE', 'new'),
+        ('ad', 'DELETE', 'old'),
+    )
+]
+
+# Column weights for bm25(): a title hit counts most, lesson text least
+RANK = 'bm25(course_search, 10.0, 4.0, 1.0)'
+
+course_search = db.table('course_search', db.column('rowid'))
+
+# engine -> whether the FTS index can be used
+_fts_state = {}
+
+
+def fts_available(engine):
+    if engine.dialect.name != 'sqlite':
+        return False
+    with engine.connect() as conn:
+        options = {row[0] for row in conn.exec_driver_sql('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in options
+
+
+def is_installed(engine):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'course_search'"
+        ).first() is not None
+
+
+def install(engine):
+    """Create the FTS table and triggers (idempotent) and index existing courses."""
+    with engine.begin() as conn:
+        for ddl in FTS_DDL:
+            conn.exec_driver_sql(ddl)
+    rebuild(engine)
+
+
+def rebuild(engine):
+    """Re-index every course from scratch."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql('DELETE FROM course_search')
+        conn.exec_driver_sql("""
+            INSERT INTO course_search (rowid, title, description, lessons)
+            SELECT course.id, course.title, course.description,
+                   coalesce((SELECT group_concat(title || ' ' || content, ' ')
+                             FROM lesson WHERE lesson.course_id = course.id), '')
+            FROM course
+        """)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    # create_all() (fresh databases, seed scripts) doesn't know about FTS
+    # tables; add it alongside the model tables
+    if fts_available(connection.engine):
+        for ddl in FTS_DDL:
+            connection.exec_driver_sql(ddl)
+
+
+@event.listens_for(db.metadata, 'after_drop')
+def _drop_search_index(target, connection, **kw):
+    if connection.engine.dialect.name == 'sqlite':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS course_search')
+
+
+def match_expression(query):
+    """
+    FTS5 MATCH string for free-text input: every word must match, as a
+    prefix (so "alg" finds "algebra"). Returns None if there are no words.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_courses(query, class_level=None):
+    """
+    Course query for catalog search, best matches first.
+
+    Uses the FTS index (title, description and lessons, ranked with bm25)
+    when available, otherwise falls back to substring matching.
+    """
+    courses = Course.query
+    if class_level:
+        courses = courses.filter_by(class_level=class_level)
+
+    match = match_expression(query or '')
+    if match is None:
+        return courses
+
+    if not _use_fts():
+        like = f"%{query}%"
+        return courses.filter(Course.title.ilike(like) | Course.description.ilike(like))
+
+    return (
+        courses
+        .join(course_search, course_search.c.rowid == Course.id)
+        .filter(db.literal_column('course_search').op('MATCH')(match))
+        .order_by(text(RANK))
+    )
+
+
+def _use_fts():
+    engine = db.engine
+    if engine not in _fts_state:
+        _fts_state[engine] = fts_available(engine) and is_installed(engine)
+    return _fts_state[engine]
@@ -0,0 +1,65 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# What a worker, `flask <command>` or a database/ script runs before doing anything
+STARTUP_CODE = 'from app import create_app; create_app()'
+
+# Modules create_app() must not import; they are loaded on first use
+HEAVY_MODULES = ('numpy', 'torch', 'sentence_transformers', 'transformers', 'onnxruntime', 'sklearn')
+
+_IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+_MEASURE_CODE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def _run(args, env=None):
+    return subprocess.run(
+        [sys.executable, *args], cwd=REPO, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def profile_imports(code=STARTUP_CODE, env=None):
+    """
+    Run ``code`` in a fresh interpreter with ``-X importtime``. Returns
+    ``(wall_seconds, rows)``, rows being ``(self_us, cumulative_us, module,
+    depth)`` in import order.
+    """
+    start = time.perf_counter()
+    result = _run(['-X', 'importtime', '-c', code], env=env)
+    wall = time.perf_counter() - start
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((int(self_us), int(cumulative_us), module, len(indent) // 2))
+    return wall, rows
+
+
+def measure_startup(code=STARTUP_CODE, env=None):
+    """
+    Run ``code`` in a fresh interpreter and return ``{'wall_s', 'seconds',
+    'rss_mib', 'loaded'}``: process wall time including interpreter start,
+    time spent in ``code``, peak RSS, and which HEAVY_MODULES ended up imported.
+    """
+    start = time.perf_counter()
+    result = _run(['-c', _MEASURE_CODE.format(code=code, heavy=HEAVY_MODULES)], env=env)
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats['wall_s'] = time.perf_counter() - start
+    return stats
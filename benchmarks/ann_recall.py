@@ -0,0 +1,76 @@
+"""
+Recall@k / latency benchmark of the IVF recommendation index against the
+exact matrix scan.
+
+    python benchmarks/ann_recall.py                  # synthetic 20k courses
+    python benchmarks/ann_recall.py --courses 50000 --lists 224
+    python benchmarks/ann_recall.py --embeddings course_embeddings.pkl
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.embedding_index import EmbeddingIndex
+from app.utils.ann_index import IVFIndex, recall_at_k
+
+
+def synthetic_embeddings(n_courses, dim=384, n_topics=200, seed=0):
+    """Clustered random vectors, roughly shaped like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, n_courses)
+    vectors = topics[labels] + 0.6 * rng.normal(size=(n_courses, dim)).astype(np.float32)
+    return {cid: vectors[cid - 1] for cid in range(1, n_courses + 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--embeddings', help='pickled {course_id: vector} file (default: synthetic)')
+    parser.add_argument('--courses', type=int, default=20000, help='synthetic catalog size')
+    parser.add_argument('--lists', type=int, default=None, help='IVF partitions (default sqrt(n))')
+    parser.add_argument('--probes', default='1,2,4,8,16,32', help='comma-separated n_probe values')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        with open(args.embeddings, 'rb') as f:
+            embeddings = pickle.load(f)
+    else:
+        embeddings = synthetic_embeddings(args.courses)
+
+    index = EmbeddingIndex.from_dict(embeddings)
+    start = time.perf_counter()
+    ann = IVFIndex.build(index, n_lists=args.lists)
+    build_time = time.perf_counter() - start
+    print(f"courses={len(index)} lists={ann.n_lists} build={build_time:.2f}s")
+
+    # Queries are student profiles: the mean of a few random courses
+    rng = np.random.default_rng(1)
+    queries = []
+    for _ in range(args.queries):
+        completed = rng.choice(index.ids, size=min(3, len(index)), replace=False).tolist()
+        queries.append((index.profile_vector(completed), index.candidate_mask(index.ids, completed)))
+
+    start = time.perf_counter()
+    exact = [index.search(q, args.k, mask=m) for q, m in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"{'exact':>8}  recall@{args.k}=1.000  {exact_ms:7.3f} ms/query")
+
+    for n_probe in [int(p) for p in args.probes.split(',')]:
+        start = time.perf_counter()
+        approx = [ann.search(q, args.k, mask=m, n_probe=n_probe) for q, m in queries]
+        approx_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([recall_at_k(e, a) for e, a in zip(exact, approx)])
+        print(f"probe={n_probe:<3} recall@{args.k}={recall:.3f}  {approx_ms:7.3f} ms/query")
+
+
+if __name__ == '__main__':
+    main()
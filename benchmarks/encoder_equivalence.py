@@ -0,0 +1,135 @@
+"""
+Equivalence / cost check of the ONNX encoder against the reference
+SentenceTransformer model.
+
+Encodes the course catalog (plus a few search-style queries) with both
+backends, each in a fresh process, and compares the vectors by cosine
+similarity. Also reports model load time, peak RSS and per-encode latency.
+Exits non-zero if any text's cosine falls below --min-cosine.
+
+    flask export-encoder                          # once, writes the ONNX model
+    python benchmarks/encoder_equivalence.py
+    python benchmarks/encoder_equivalence.py --threads 2 --min-cosine 0.97
+"""
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'edulink.db')
+
+QUERIES = [
+    "fractions",
+    "how plants make food",
+    "learn english grammar for beginners",
+    "python programming",
+    "history of india",
+]
+
+
+def sample_texts():
+    """Course texts as the embedding queue builds them, plus sample queries."""
+    from app.utils.embedding_queue import course_text
+
+    texts = list(QUERIES)
+    if os.path.exists(DATABASE):
+        conn = sqlite3.connect(f"file:{DATABASE}?mode=ro", uri=True)
+        try:
+            for title, description in conn.execute("SELECT title, description FROM course ORDER BY id"):
+                texts.append(course_text(SimpleNamespace(title=title, description=description)))
+        finally:
+            conn.close()
+    return texts
+
+
+def run_backend(backend, texts_file, vectors_file):
+    """Child process: load one backend, encode, save vectors, print stats as JSON."""
+    from app.utils import embedding_service
+
+    with open(texts_file) as f:
+        texts = json.load(f)
+
+    start = time.perf_counter()
+    embedding_service.preload()
+    load_s = time.perf_counter() - start
+
+    embedding_service.encode(texts[:1])  # Warm-up
+    single = []
+    for text in texts:
+        start = time.perf_counter()
+        embedding_service.encode(text)
+        single.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    vectors = np.asarray(embedding_service.encode(texts), dtype=np.float32)
+    batch_s = time.perf_counter() - start
+    np.save(vectors_file, vectors)
+
+    print(json.dumps({
+        'load_s': load_s,
+        'rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'single_ms': float(np.median(single) * 1000),
+        'batch_texts_per_s': len(texts) / batch_s,
+    }))
+
+
+def measure(backend, texts_file, tmp, threads):
+    vectors_file = os.path.join(tmp, f'{backend}.npy')
+    env = dict(os.environ, EMBEDDING_BACKEND=backend)
+    if threads:
+        env['EMBEDDING_THREADS'] = str(threads)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', backend, texts_file, vectors_file],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1]), np.load(vectors_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-cosine', type=float, default=0.98)
+    parser.add_argument('--threads', type=int, default=None, help='EMBEDDING_THREADS for both backends')
+    parser.add_argument('--child', nargs=3, metavar=('BACKEND', 'TEXTS', 'VECTORS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_backend(*args.child)
+        return 0
+
+    texts = sample_texts()
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_file = os.path.join(tmp, 'texts.json')
+        with open(texts_file, 'w') as f:
+            json.dump(texts, f)
+        results = {backend: measure(backend, texts_file, tmp, args.threads) for backend in ('torch', 'onnx')}
+
+    print(f"texts={len(texts)}")
+    for backend, (stats, _) in results.items():
+        print(f"{backend:>6}  load={stats['load_s']:6.2f}s  peak rss={stats['rss_mib']:7.1f} MiB  "
+              f"single={stats['single_ms']:7.2f} ms  batch={stats['batch_texts_per_s']:8.1f} texts/s")
+
+    reference, candidate = results['torch'][1], results['onnx'][1]
+    cosines = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    worst = int(np.argmin(cosines))
+    print(f"cosine  mean={cosines.mean():.4f}  min={cosines[worst]:.4f}  ({texts[worst][:60]!r})")
+    if cosines[worst] < args.min_cosine:
+        print(f"FAIL: cosine below {args.min_cosine}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Overhead check for the request instrumentation (app/utils/request_metrics.py).
+
+Seeds a scratch SQLite database, then requests the same pages through an
+app with METRICS on and one with it off, alternating rounds so both see
+the same cache and disk state. Reports the mean time per request and the
+relative overhead; exits non-zero above --max-overhead percent.
+
+    python benchmarks/instrumentation_overhead.py
+    python benchmarks/instrumentation_overhead.py --rounds 50 --max-overhead 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from benchmarks.seed import seed_synthetic
+
+SCALE = dict(students=40, courses=200, enrollments_per_student=10, lessons_per_course=8, videos_per_course=4)
+
+# (role, user id, url) — user 2 is the first student
+PAGES = [
+    ("student", 2, "/student/dashboard"),
+    ("student", 2, "/student/course/3"),
+    ("student", 2, "/student/courses"),
+    (None, None, "/student/courses/feed"),
+]
+
+
+def make_client(app, role, user_id):
+    client = app.test_client()
+    if role:
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["role"] = role
+    return client
+
+
+def run_round(app):
+    start = time.perf_counter()
+    for role, user_id, url in PAGES:
+        response = make_client(app, role, user_id).get(url, buffered=True)
+        response.close()  # Triggers the call_on_close recording
+        assert response.status_code == 200, (url, response.status_code)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--max-overhead", type=float, default=5.0, help="percent")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "check.db"),
+            "RECOMMENDATION_CACHE": "none",
+            "SLOW_REQUEST_MS": float("inf"),
+        }
+        apps = {
+            "off": create_app({**config, "METRICS": False}),
+            "on": create_app({**config, "METRICS": True}),
+        }
+        with apps["off"].app_context():
+            seed_synthetic(**SCALE)
+
+        for app in apps.values():
+            run_round(app)  # Warm-up
+        totals = {name: 0.0 for name in apps}
+        for _ in range(args.rounds):
+            for name, app in apps.items():
+                totals[name] += run_round(app)
+
+    requests = args.rounds * len(PAGES)
+    off, on = totals["off"] / requests, totals["on"] / requests
+    overhead = (on - off) / off * 100
+    print(f"requests={requests} per app")
+    print(f"metrics off  {off * 1000:7.3f} ms/request")
+    print(f"metrics on   {on * 1000:7.3f} ms/request  ({overhead:+.1f}%)")
+    if overhead > args.max_overhead:
+        print(f"FAIL: overhead above {args.max_overhead}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+Load test of the core student journey.
+
+Seeds a scratch SQLite database at a configurable scale, then runs
+``--workers`` concurrent virtual students, each repeating the journey
+
+    login -> home -> course detail -> complete_video -> catalog search
+
+``--iterations`` times, either through the Flask test client (default) or
+over HTTP against a local threaded WSGI server (``--http``). Reports
+p50/p95/p99 latency and throughput per step.
+
+``--save`` writes the results as a JSON baseline; ``--baseline`` compares
+against one and exits non-zero when a step's p50 or p95 latency grew, or
+overall throughput fell, by more than ``--tolerance`` (or any request
+failed). Baselines are machine-specific: record and compare them on the
+same host.
+
+    python benchmarks/load_test.py --save /tmp/baseline.json
+    python benchmarks/load_test.py --baseline /tmp/baseline.json
+    python benchmarks/load_test.py --students 500 --courses 2000 --workers 16 --http
+    python benchmarks/load_test.py --set PROGRESS_BUFFER=true
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import Enrollment, User, Video
+from benchmarks.seed import PASSWORD, seed_synthetic
+
+STEPS = ["login", "home", "course detail", "complete_video", "search"]
+
+SEARCH_TERMS = ["mathematics", "science", "english grammar", "computer", "art", "class 5"]
+
+
+class ClientSession:
+    """One virtual user on the Flask test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, url):
+        response = self.client.get(url, buffered=True)
+        response.close()
+        return response.status_code
+
+    def post(self, url, form=None, json_body=None):
+        response = self.client.post(url, data=form, json=json_body, buffered=True)
+        response.close()
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # Time each request on its own
+
+
+class HttpSession:
+    """One virtual user over HTTP, with its own cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def get(self, url):
+        return self._open(urllib.request.Request(self.base_url + url))
+
+    def post(self, url, form=None, json_body=None):
+        if json_body is not None:
+            data, content_type = json.dumps(json_body).encode(), "application/json"
+        else:
+            data, content_type = urllib.parse.urlencode(form or {}).encode(), "application/x-www-form-urlencoded"
+        return self._open(urllib.request.Request(
+            self.base_url + url, data=data, headers={"Content-Type": content_type}
+        ))
+
+
+def journey_data(app):
+    """``[(username, [(course_id, [video ids])...])]`` for every seeded student."""
+    with app.app_context():
+        videos = defaultdict(list)
+        for video_id, course_id in db.session.query(Video.id, Video.course_id):
+            videos[course_id].append(video_id)
+        enrolled = defaultdict(list)
+        rows = (
+            db.session.query(User.username, Enrollment.course_id)
+            .join(Enrollment, Enrollment.student_id == User.id)
+            .filter(User.role == "student")
+        )
+        for username, course_id in rows:
+            enrolled[username].append((course_id, videos[course_id]))
+    return sorted(enrolled.items())
+
+
+def run_worker(session_factory, students, iterations, seed, samples, errors):
+    rng = random.Random(seed)
+    for _ in range(iterations):
+        username, courses = rng.choice(students)
+        course_id, video_ids = rng.choice(courses)
+        session = session_factory()
+        requests = [
+            ("login", lambda: session.post("/login", form={"username": username, "password": PASSWORD}), 302),
+            ("home", lambda: session.get("/student/home"), 200),
+            ("course detail", lambda: session.get(f"/student/course/{course_id}"), 200),
+            ("complete_video", lambda: session.post(
+                f"/student/complete_video/{rng.choice(video_ids)}", json_body={}), 200),
+            ("search", lambda: session.get("/student/courses?" + urllib.parse.urlencode(
+                {"q": rng.choice(SEARCH_TERMS)})), 200),
+        ]
+        for step, send, expected in requests:
+            if step == "complete_video" and not video_ids:
+                continue
+            start = time.perf_counter()
+            status = send()
+            samples[step].append(time.perf_counter() - start)
+            if status != expected:
+                errors[step] += 1
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, errors, wall):
+    results = {}
+    for step in STEPS:
+        values = sorted(samples[step])
+        results[step] = {
+            "requests": len(values),
+            "errors": errors[step],
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "rps": len(values) / wall,
+        }
+    total = sum(len(values) for values in samples.values())
+    return {"steps": results, "requests": total, "errors": sum(errors.values()),
+            "wall_s": wall, "rps": total / wall}
+
+
+def compare(results, baseline, tolerance):
+    """Regression messages for ``results`` against ``baseline``."""
+    problems = []
+    for step, base in baseline["steps"].items():
+        current = results["steps"].get(step)
+        if current is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if current[key] > base[key] * (1 + tolerance):
+                problems.append(f"{step} {key}: {current[key]:.1f} > {base[key]:.1f} (+{tolerance:.0%})")
+    if results["rps"] < baseline["rps"] * (1 - tolerance):
+        problems.append(f"throughput: {results['rps']:.1f} < {baseline['rps']:.1f} req/s (-{tolerance:.0%})")
+    return problems
+
+
+def parse_setting(text):
+    key, _, value = text.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--enrollments", type=int, default=5, help="per student")
+    parser.add_argument("--lessons", type=int, default=6, help="per course")
+    parser.add_argument("--videos", type=int, default=3, help="per course")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent virtual students")
+    parser.add_argument("--iterations", type=int, default=10, help="journeys per worker")
+    parser.add_argument("--http", action="store_true", help="go through a local threaded WSGI server")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="app config override (value parsed as JSON if possible)")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    scale = {"students": args.students, "courses": args.courses, "enrollments_per_student": args.enrollments,
+             "lessons_per_course": args.lessons, "videos_per_course": args.videos}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "load.db"),
+            "SLOW_REQUEST_MS": float("inf"),
+            **dict(parse_setting(text) for text in args.set),
+        })
+        with app.app_context():
+            counts = seed_synthetic(**scale)
+        students = journey_data(app)
+        print("seeded " + " ".join(f"{name}={count}" for name, count in counts.items()))
+
+        server = None
+        if args.http:
+            from werkzeug.serving import make_server
+
+            logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No per-request access log
+            server = make_server("127.0.0.1", 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_port}"
+            session_factory = lambda: HttpSession(base_url)
+        else:
+            session_factory = lambda: ClientSession(app)
+
+        # Warm-up: first-request costs (templates, model loads) aren't measured
+        run_worker(session_factory, students, 1, -1, defaultdict(list), defaultdict(int))
+
+        samples, errors = defaultdict(list), defaultdict(int)
+        threads = [
+            threading.Thread(target=run_worker,
+                             args=(session_factory, students, args.iterations, seed, samples, errors))
+            for seed in range(args.workers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        if server is not None:
+            server.shutdown()
+        from app.utils.progress_buffer import progress_buffer
+        if progress_buffer.enabled:
+            progress_buffer.close()
+
+    results = summarize(samples, errors, wall)
+    results.update(scale=scale, workers=args.workers, iterations=args.iterations,
+                   transport="http" if args.http else "test client")
+
+    print(f"{'step':<16}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+    for step, row in results["steps"].items():
+        print(f"{step:<16}{row['requests']:>9}{row['errors']:>8}{row['p50_ms']:>9.1f}"
+              f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['rps']:>9.1f}")
+    print(f"total {results['requests']} requests in {wall:.2f}s = {results['rps']:.1f} req/s "
+          f"({args.workers} workers, {results['transport']})")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    status = 0
+    if results["errors"]:
+        print(f"FAIL: {results['errors']} requests returned an unexpected status")
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            status = 1
+        else:
+            print(f"Within {args.tolerance:.0%} of {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
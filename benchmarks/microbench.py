@@ -0,0 +1,214 @@
+"""
+Microbenchmarks of the recommendation and embedding layer, without the
+web app.
+
+For each synthetic catalog size (default 1k, 10k and 100k course vectors)
+times:
+
+    pickle_load        pickle.load of a {course_id: vector} file, the
+                       course_embeddings.pkl format
+    store_load         EmbeddingStore.load_index() of a fresh store object
+    recommend_courses  one recommendation (3 completed courses, every
+                       course a candidate) through recommendation.py
+
+and once, if the sentence encoder can be loaded, ``encode`` of the same
+texts one at a time and as one batch (per text).
+
+Each benchmark runs for at least --min-time seconds (and --min-rounds
+rounds); min/median/mean/stddev are reported, pytest-benchmark style.
+Every run is appended as one JSON line to benchmarks/results/microbench.jsonl,
+which is kept in git, together with the commit it measured; the table
+compares each median with the latest earlier entry from the same host.
+A run from a tree with uncommitted changes measures no commit, so it is
+not saved unless --force is given (use --no-save to just look).
+
+    python benchmarks/microbench.py
+    python benchmarks/microbench.py --sizes 1000,10000 --no-save
+    python benchmarks/microbench.py --dtype int8
+"""
+import argparse
+import datetime
+import json
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import cycle
+
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import recommendation
+from app.utils.embedding_store import EmbeddingStore
+from benchmarks.ann_recall import synthetic_embeddings
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(REPO, 'benchmarks', 'results', 'microbench.jsonl')
+
+ENCODE_TEXTS = [
+    f"Class {level}: an introduction to {subject} with worked examples and practice questions."
+    for level in range(1, 9) for subject in ("fractions", "plants", "grammar", "maps")
+]
+
+
+def bench(fn, min_rounds=5, min_time=0.5, max_rounds=1000):
+    """Call ``fn`` repeatedly after one warm-up call; timing stats in milliseconds."""
+    fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_rounds or (time.perf_counter() - start < min_time and len(times) < max_rounds):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {
+        'rounds': len(times),
+        'min_ms': min(times),
+        'median_ms': statistics.median(times),
+        'mean_ms': statistics.fmean(times),
+        'stddev_ms': statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def bench_catalog(size, dtype, tmp, args):
+    embeddings = synthetic_embeddings(size)
+    results = {}
+
+    pickle_path = os.path.join(tmp, f'{size}.pkl')
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(embeddings, f)
+
+    def load_pickle():
+        with open(pickle_path, 'rb') as f:
+            pickle.load(f)
+    results['pickle_load'] = bench(load_pickle, args.min_rounds, args.min_time)
+
+    store_path = os.path.join(tmp, f'{size}.store')
+    EmbeddingStore(store_path, dtype=dtype).initialize(embeddings)
+    results['store_load'] = bench(
+        lambda: EmbeddingStore(store_path, dtype=dtype).load_index(), args.min_rounds, args.min_time
+    )
+
+    recommendation.use_store(EmbeddingStore(store_path, dtype=dtype))
+    all_course_ids = list(embeddings)
+    rng = np.random.default_rng(0)
+    profiles = cycle([(rng.choice(size, 3, replace=False) + 1).tolist() for _ in range(1000)])
+    results['recommend_courses'] = bench(
+        lambda: recommendation.recommend_courses(next(profiles), all_course_ids, top_n=5),
+        args.min_rounds, args.min_time,
+    )
+    return results
+
+
+def bench_encode(args):
+    """Per-text encode cost one at a time and batched, or None without a model."""
+    from app.utils import embedding_service
+
+    try:
+        embedding_service.preload()
+    except Exception as e:  # No model installed (or downloadable) here
+        print(f"Skipping encode benchmarks: {type(e).__name__}: {e}")
+        return None
+
+    per_text = len(ENCODE_TEXTS)
+    single = bench(lambda: [embedding_service.encode(text) for text in ENCODE_TEXTS],
+                   args.min_rounds, args.min_time)
+    batch = bench(lambda: embedding_service.encode(ENCODE_TEXTS), args.min_rounds, args.min_time)
+    results = {}
+    for name, stats in (('encode_single', single), ('encode_batch', batch)):
+        results[name] = {key: value / per_text if key.endswith('_ms') else value
+                         for key, value in stats.items()}
+    return results
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def previous_run(path, host):
+    """The latest recorded run from ``host``, or None."""
+    if not os.path.exists(path):
+        return None
+    latest = None
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry.get('host') == host:
+                    latest = entry
+    return latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated catalog sizes')
+    parser.add_argument('--dtype', default='float32', help='embedding store encoding')
+    parser.add_argument('--min-rounds', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds per benchmark')
+    parser.add_argument('--skip-encode', action='store_true')
+    parser.add_argument('--output', default=RESULTS_FILE, help='results file to append to')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--force', action='store_true', help='save even from a dirty working tree')
+    args = parser.parse_args()
+
+    commit, dirty = git_revision()
+    if not args.no_save and (commit is None or dirty) and not args.force:
+        print("Refusing to save results for uncommitted changes: commit first, "
+              "or pass --no-save (or --force)")
+        return 1
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(size) for size in args.sizes.split(',')):
+            results[str(size)] = bench_catalog(size, args.dtype, tmp, args)
+    if not args.skip_encode:
+        encode = bench_encode(args)
+        if encode:
+            results['encoder'] = encode
+
+    host = platform.node()
+    run = {
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'host': host,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'dtype': args.dtype,
+        'results': results,
+    }
+    previous = previous_run(args.output, host)
+
+    print(f"{'catalog':>8}  {'benchmark':<18}{'median ms':>11}{'min ms':>10}{'stddev':>9}{'rounds':>8}  vs previous")
+    for catalog, benchmarks in results.items():
+        for name, stats in benchmarks.items():
+            change = ''
+            before = (previous or {}).get('results', {}).get(catalog, {}).get(name)
+            if before and previous.get('dtype') == args.dtype:
+                change = f"{stats['median_ms'] / before['median_ms']:.2f}x ({previous['commit']})"
+            print(f"{catalog:>8}  {name:<18}{stats['median_ms']:>11.3f}{stats['min_ms']:>10.3f}"
+                  f"{stats['stddev_ms']:>9.3f}{stats['rounds']:>8}  {change}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(run) + '\n')
+        print(f"Appended results to {os.path.relpath(args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
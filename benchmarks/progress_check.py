@@ -0,0 +1,168 @@
+"""
+Progress counter check.
+
+Walks one student through a course on a scratch SQLite database while a
+volunteer adds and deletes items, and checks /student/course/<id>/progress
+and the course's completion count after every step. Then completes a
+course's items from several threads at once, half through the progress
+buffer (PROGRESS_BUFFER) and half synchronously, and checks that no
+completion was lost. Finally progress.recompute() and course_stats.verify()
+(`flask recompute-progress`, `flask course-stats verify`) must find
+nothing to repair. Exits non-zero on any mismatch.
+
+    python benchmarks/progress_check.py
+"""
+import os
+import sys
+import tempfile
+import threading
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import CourseStats, Lesson, Video
+from app.utils import course_stats, progress
+from app.utils.progress_buffer import progress_buffer
+from benchmarks.seed import seed_synthetic
+
+VOLUNTEER, STUDENT = 1, 2
+# Course 1 walks through the steps below; course 2 is completed concurrently
+LESSONS, VIDEOS = 2, 1
+RACE_LESSONS, RACE_VIDEOS = 12, 12
+
+
+class Checker:
+    def __init__(self, app):
+        self.app = app
+        self.client = app.test_client()
+        self.failures = []
+
+    def login(self, user_id, role):
+        with self.client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["role"] = role
+
+    def post(self, user_id, role, url, **kwargs):
+        self.login(user_id, role)
+        response = self.client.post(url, **kwargs)
+        if response.status_code not in (200, 302):
+            self.failures.append(f"POST {url} returned {response.status_code}")
+        return response
+
+    def expect(self, step, course_id, completed, total, completions):
+        self.login(STUDENT, "student")
+        summary = self.client.get(f"/student/course/{course_id}/progress").get_json()
+        percent = round(completed / total * 100, 1) if total else 0
+        got = (summary["completed_items"], summary["total_items"], summary["percent_complete"])
+        status = "ok"
+        if got != (completed, total, percent):
+            self.failures.append(f"{step}: progress {got}, expected {(completed, total, percent)}")
+            status = "FAIL"
+        # Buffered completions are in the JSON above but not in CourseStats yet
+        progress_buffer.flush()
+        with self.app.app_context():
+            stored = db.session.get(CourseStats, course_id).completion_count
+        if stored != completions:
+            self.failures.append(f"{step}: completion_count {stored}, expected {completions}")
+            status = "FAIL"
+        print(f"{status:<6} {step:<34} {completed}/{total} = {summary['percent_complete']}%")
+
+
+def item_ids(app, model, course_id):
+    with app.app_context():
+        return [item.id for item in model.query.filter_by(course_id=course_id).order_by(model.id)]
+
+
+def walk_through(check, app):
+    lessons, videos = item_ids(app, Lesson, 1), item_ids(app, Video, 1)
+    check.post(STUDENT, "student", "/student/enroll/1")
+    check.expect("enrolled", 1, 0, 3, 0)
+    check.post(STUDENT, "student", f"/student/lesson/{lessons[0]}/complete")
+    check.expect("lesson completed", 1, 1, 3, 0)
+    check.post(STUDENT, "student", f"/student/complete_video/{videos[0]}", json={})
+    check.expect("video completed (buffered)", 1, 2, 3, 0)
+    check.post(STUDENT, "student", f"/student/lesson/{lessons[1]}/complete")
+    check.expect("course finished", 1, 3, 3, 1)
+
+    check.post(VOLUNTEER, "volunteer", "/volunteer/course/1/add_lesson", data={"title": "New", "content": "More"})
+    check.expect("volunteer added a lesson", 1, 3, 4, 0)
+    check.post(STUDENT, "student", f"/student/lesson/{item_ids(app, Lesson, 1)[-1]}/complete")
+    check.expect("new lesson completed", 1, 4, 4, 1)
+
+    check.post(VOLUNTEER, "volunteer", "/volunteer/course/1/add_video",
+               data={"title": "New", "url": "https://youtu.be/check"})
+    check.expect("volunteer added a video", 1, 4, 5, 0)
+    check.post(VOLUNTEER, "volunteer", f"/volunteer/video/{item_ids(app, Video, 1)[-1]}/delete")
+    check.expect("unwatched video deleted", 1, 4, 4, 1)
+    check.post(VOLUNTEER, "volunteer", f"/volunteer/video/{videos[0]}/delete")
+    check.expect("watched video deleted", 1, 3, 3, 1)
+
+
+def race(check, app, threads=4):
+    lessons, videos = item_ids(app, Lesson, 2), item_ids(app, Video, 2)
+    check.post(STUDENT, "student", "/student/enroll/2")
+
+    def complete(urls, as_json):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = STUDENT
+            sess["role"] = "student"
+        for url in urls:
+            client.post(url, json={}) if as_json else client.post(url)
+
+    work = [([f"/student/lesson/{i}/complete" for i in lessons[n::threads]], False) for n in range(threads)]
+    work += [([f"/student/complete_video/{i}" for i in videos[n::threads]], True) for n in range(threads)]
+    workers = [threading.Thread(target=complete, args=args) for args in work]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    progress_buffer.flush()
+    total = RACE_LESSONS + RACE_VIDEOS
+    check.expect(f"{len(workers)} threads completed", 2, total, total, 1)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "check.db"),
+            "RECOMMENDATION_CACHE": "none",
+            "PROGRESS_BUFFER": True,
+            "PROGRESS_BUFFER_INTERVAL_MS": 20,
+        })
+        with app.app_context():
+            seed_synthetic(students=1, courses=2, lessons_per_course=LESSONS, videos_per_course=VIDEOS,
+                           enrollments_per_student=0)
+            # Course 2 gets enough items for the threads to overlap
+            db.session.execute(db.insert(Lesson), [
+                {"course_id": 2, "title": f"Extra {n}", "content": "..."}
+                for n in range(RACE_LESSONS - LESSONS)
+            ])
+            db.session.execute(db.insert(Video), [
+                {"course_id": 2, "title": f"Extra {n}", "url": f"https://youtu.be/extra{n}"}
+                for n in range(RACE_VIDEOS - VIDEOS)
+            ])
+            db.session.commit()
+            course_stats.rebuild()
+
+        check = Checker(app)
+        walk_through(check, app)
+        race(check, app)
+        progress_buffer.close()
+
+        with app.app_context():
+            repaired = progress.recompute()
+            drift = course_stats.verify()
+        if repaired:
+            check.failures.append(f"recompute-progress repaired {repaired} rows")
+        for course_id, stored, expected in drift:
+            check.failures.append(f"course {course_id} stats drifted: stored={stored} expected={expected}")
+
+    for failure in check.failures:
+        print(f"FAIL: {failure}")
+    return 1 if check.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
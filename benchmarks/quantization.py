@@ -0,0 +1,81 @@
+"""
+Memory / speed / recall@k of quantized embedding storage (float16, int8)
+against full-precision float32.
+
+Recommendations are computed for the same student profiles with each
+encoding; recall is the overlap of each top-k with the float32 top-k.
+
+    python benchmarks/quantization.py                         # course_embeddings.pkl
+    python benchmarks/quantization.py --synthetic --courses 100000
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.embedding_index import DTYPES, EmbeddingIndex
+from app.utils.ann_index import recall_at_k
+from benchmarks.ann_recall import synthetic_embeddings
+
+DEFAULT_EMBEDDINGS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'course_embeddings.pkl')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--embeddings', default=DEFAULT_EMBEDDINGS, help='pickled {course_id: vector} file')
+    parser.add_argument('--synthetic', action='store_true', help='use a synthetic catalog instead')
+    parser.add_argument('--courses', type=int, default=20000, help='synthetic catalog size')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=256, help='queries per search_batch call')
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        embeddings = synthetic_embeddings(args.courses)
+    else:
+        with open(args.embeddings, 'rb') as f:
+            embeddings = pickle.load(f)
+
+    indexes = {dtype: EmbeddingIndex.from_dict(embeddings, dtype=dtype) for dtype in DTYPES}
+    reference = indexes['float32']
+
+    # Queries are student profiles: the mean of a few random courses, taken
+    # from the float32 index so every encoding answers the same question
+    rng = np.random.default_rng(1)
+    profiles, masks, exclude = [], [], []
+    for _ in range(args.queries):
+        completed = rng.choice(reference.ids, size=min(3, len(reference)), replace=False).tolist()
+        profiles.append(reference.profile_vector(completed))
+        masks.append(reference.candidate_mask(reference.ids, completed))
+        exclude.append(reference.rows_for(completed))
+    profiles = np.vstack(profiles)
+
+    print(f"courses={len(reference)} dim={reference.matrix.shape[1]} queries={args.queries} k={args.k}")
+    baseline = None
+    for dtype, index in indexes.items():
+        memory = index.matrix.nbytes + (index.scales.nbytes if index.scales is not None else 0)
+
+        start = time.perf_counter()
+        single = [index.search(q, args.k, mask=m) for q, m in zip(profiles, masks)]
+        single_ms = (time.perf_counter() - start) * 1000 / len(profiles)
+
+        start = time.perf_counter()
+        for i in range(0, len(profiles), args.batch):
+            index.search_batch(profiles[i:i + args.batch], args.k, exclude=exclude[i:i + args.batch])
+        batch_qps = len(profiles) / (time.perf_counter() - start)
+
+        if baseline is None:
+            baseline = single
+        recall = np.mean([recall_at_k(e, a) for e, a in zip(baseline, single)])
+        print(f"{dtype:>8}  {memory / 2**20:9.2f} MiB  recall@{args.k}={recall:.3f}  "
+              f"{single_ms:7.3f} ms/query  {batch_qps:10.0f} queries/s batched")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Query-count regression check.
+
+Seeds a scratch SQLite database at a small and a large catalog size and
+counts the SQL statements each page issues. Exits non-zero if any page's
+query count grows with the amount of data (an N+1 query).
+
+    python benchmarks/query_budget.py
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from benchmarks.seed import seed_synthetic
+
+SMALL = dict(students=5, courses=5, enrollments_per_student=2, lessons_per_course=2, videos_per_course=1)
+LARGE = dict(students=40, courses=80, enrollments_per_student=10, lessons_per_course=12, videos_per_course=6)
+
+# (name, role, user id, url) — volunteer1 owns every course when seeded
+# with one volunteer; user 2 is the first student. Role None is a guest.
+PAGES = [
+    ("volunteer dashboard", "volunteer", 1, "/volunteer/dashboard"),
+    ("student home", "student", 2, "/student/home"),
+    ("student dashboard", "student", 2, "/student/dashboard"),
+    ("course detail", "student", 2, "/student/course/3"),
+    ("course detail (guest)", None, None, "/student/course/3"),
+]
+
+
+@contextmanager
+def count_queries(*engines):
+    """Collect the SQL statements executed on ``engines`` inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def measure(scale):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "check.db"),
+            "RECOMMENDATION_CACHE": "none",
+        })
+        counts = {}
+        with app.app_context():
+            seed_synthetic(**scale)
+            # GET pages read through the read-only pool, so count on every engine
+            engines = list(db.engines.values())
+        client = app.test_client()
+        for name, role, user_id, url in PAGES:
+            with client.session_transaction() as sess:
+                sess.clear()
+                if role:
+                    sess["user_id"] = user_id
+                    sess["role"] = role
+            with app.app_context(), count_queries(*engines) as statements:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise SystemExit(f"{name}: GET {url} returned {response.status_code}")
+            counts[name] = len(statements)
+        for engine in engines:
+            engine.dispose()
+        return counts
+
+
+def main():
+    small = measure(SMALL)
+    large = measure(LARGE)
+    failed = False
+    for name, _, _, url in PAGES:
+        status = "ok" if large[name] <= small[name] else "GROWS"
+        failed |= status != "ok"
+        print(f"{status:5}  {name:24} {url:32} small={small[name]:3}  large={large[name]:3}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Query-plan regression check.
+
+Seeds a scratch SQLite database, requests every main page, and runs
+EXPLAIN QUERY PLAN on each SQL statement the pages issued. Exits non-zero
+if any statement does a full table scan that is not explicitly allowed.
+
+    python benchmarks/query_plans.py            # report failures only
+    python benchmarks/query_plans.py --verbose  # print every plan
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+from sqlalchemy import event
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.utils.pagination import encode_cursor
+from benchmarks.seed import seed_synthetic
+
+SCALE = dict(students=30, courses=60, enrollments_per_student=5)
+
+# (role, user id, method, url, json body or None). User 1 is the volunteer
+# owning every course, user 2 the first student.
+REQUESTS = [
+    (None, None, "GET", "/student/courses", None),
+    (None, None, "GET", "/student/courses?class_level=3", None),
+    (None, None, "GET", "/student/courses?class_level=3&q=Science", None),
+    (None, None, "GET", "/student/courses?cursor=" + encode_cursor([3, 10]), None),
+    (None, None, "GET", "/student/courses/feed?class_level=3&cursor=" + encode_cursor([3, 10]), None),
+    (None, None, "GET", "/student/course/7", None),
+    ("student", 2, "GET", "/student/dashboard", None),
+    ("student", 2, "GET", "/student/home", None),
+    ("student", 2, "GET", "/student/course/7", None),
+    ("student", 2, "GET", "/student/course/7/watch", None),
+    ("student", 2, "GET", "/student/course/7/progress", None),
+    ("student", 2, "POST", "/student/enroll/9", None),
+    ("student", 2, "POST", "/student/lesson/30/complete", None),
+    ("student", 2, "POST", "/student/complete_video/14", {}),
+    ("student", 2, "POST", "/student/progress/9/update", None),
+    ("volunteer", 1, "GET", "/volunteer/dashboard", None),
+    ("volunteer", 1, "GET", "/volunteer/dashboard?class_level=3", None),
+    ("volunteer", 1, "GET", "/volunteer/course/7/manage_videos", None),
+    ("volunteer", 1, "POST", "/volunteer/course/7/add_lesson", None),
+    ("volunteer", 1, "POST", "/volunteer/video/13/delete", None),
+]
+
+# Full scans that are the point of the query, keyed by a URL prefix:
+# collecting every course id as recommendation candidates has to read
+# every course.
+ALLOWED_SCANS = {
+    ("/student/home", "course"),
+}
+
+SCAN_RE = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def capture(app, engines):
+    """Run REQUESTS, returning [(url, statement, parameters)] from all ``engines``."""
+    captured = []
+    current = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            captured.append((current["url"], statement, parameters))
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        client = app.test_client()
+        for role, user_id, method, url, body in REQUESTS:
+            with client.session_transaction() as sess:
+                sess.clear()
+                if role:
+                    sess["user_id"] = user_id
+                    sess["role"] = role
+            current["url"] = url
+            data = {"title": "Extra", "content": "Extra lesson."} if url.endswith("add_lesson") else None
+            response = client.open(url, method=method, json=body, data=data, buffered=True)
+            if response.status_code >= 400:
+                raise SystemExit(f"{method} {url} returned {response.status_code}")
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def full_scans(conn, statement, parameters):
+    """(plan lines, tables fully scanned) for one statement."""
+    plan = [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+    scans = []
+    for detail in plan:
+        match = SCAN_RE.match(detail.strip())
+        if match:
+            scans.append(match.group(1))
+    return plan, scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "plans.db"),
+            "RECOMMENDATION_CACHE": "none",
+            "EMBEDDING_ASYNC": False,
+        })
+        with app.app_context():
+            seed_synthetic(**SCALE)
+            engine = db.engine
+            captured = capture(app, list(db.engines.values()))
+
+            failures = 0
+            seen = set()
+            with engine.connect() as conn:
+                for url, statement, parameters in captured:
+                    if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                        continue
+                    if "sqlite_master" in statement:
+                        continue  # One-off schema probes
+                    if (url, statement) in seen:
+                        continue
+                    seen.add((url, statement))
+
+                    plan, scans = full_scans(conn, statement, parameters)
+                    bad = [t for t in scans if not any(
+                        url.startswith(prefix) and t == table for prefix, table in ALLOWED_SCANS
+                    )]
+                    if bad or args.verbose:
+                        print(f"{'SCAN' if bad else 'ok':4}  {url}")
+                        print("      " + " ".join(statement.split())[:200])
+                        for line in plan:
+                            print("        " + line)
+                    failures += bool(bad)
+            for bind in db.engines.values():
+                bind.dispose()
+
+    print(f"{len(seen)} statements checked, {failures} with full table scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Synthetic data for benchmarks and query checks.
+
+Uses Core bulk inserts so large catalogs seed in seconds. Every student
+gets the password "password123".
+"""
+import random
+
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    User, Course, Lesson, Video, Enrollment, Progress, LessonProgress, VideoProgress
+)
+from app.utils import course_stats
+
+PASSWORD = "password123"
+
+SUBJECTS = ["Mathematics", "Science", "English", "Social Studies", "Computer Science", "Art & Creativity"]
+
+
+def seed_synthetic(students=10, courses=20, lessons_per_course=4, videos_per_course=2,
+                   enrollments_per_student=3, volunteers=1, seed=0):
+    """
+    Drop and recreate all tables, then fill them with synthetic rows.
+    Must run inside an app context. Returns a dict of row counts.
+    """
+    rng = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+
+    # Hashing is slow; every user shares one hash
+    password = generate_password_hash(PASSWORD)
+    db.session.execute(db.insert(User), [
+        {"id": i, "username": f"volunteer{i}", "password": password, "role": "volunteer"}
+        for i in range(1, volunteers + 1)
+    ] + [
+        {"id": volunteers + i, "username": f"student{i}", "password": password, "role": "student"}
+        for i in range(1, students + 1)
+    ])
+    student_ids = list(range(volunteers + 1, volunteers + students + 1))
+
+    course_rows = []
+    for cid in range(1, courses + 1):
+        subject = SUBJECTS[cid % len(SUBJECTS)]
+        level = (cid % 12) + 1
+        course_rows.append({
+            "id": cid,
+            "title": f"{subject} - Class {level} #{cid}",
+            "description": f"Class {level}: synthetic {subject.lower()} course {cid}.",
+            "class_level": level,
+            "volunteer_id": (cid % volunteers) + 1,
+        })
+    db.session.execute(db.insert(Course), course_rows)
+
+    lesson_rows = [
+        {"course_id": cid, "title": f"Lesson {n}", "content": f"Content of lesson {n} of course {cid}."}
+        for cid in range(1, courses + 1) for n in range(1, lessons_per_course + 1)
+    ]
+    if lesson_rows:
+        db.session.execute(db.insert(Lesson), lesson_rows)
+    video_rows = [
+        {"course_id": cid, "title": f"Video {n}", "url": f"https://www.youtube.com/embed/vid{cid}x{n}"}
+        for cid in range(1, courses + 1) for n in range(1, videos_per_course + 1)
+    ]
+    if video_rows:
+        db.session.execute(db.insert(Video), video_rows)
+
+    # Lesson/video ids were assigned in insertion order
+    lesson_ids = {cid: range((cid - 1) * lessons_per_course + 1, cid * lessons_per_course + 1)
+                  for cid in range(1, courses + 1)}
+    video_ids = {cid: range((cid - 1) * videos_per_course + 1, cid * videos_per_course + 1)
+                 for cid in range(1, courses + 1)}
+
+    enrollment_rows, progress_rows, lesson_progress_rows, video_progress_rows = [], [], [], []
+    for student_id in student_ids:
+        for cid in rng.sample(range(1, courses + 1), min(enrollments_per_student, courses)):
+            done_lessons = rng.randint(0, lessons_per_course)
+            done_videos = rng.randint(0, videos_per_course)
+            total = lessons_per_course + videos_per_course
+            enrollment_rows.append({"student_id": student_id, "course_id": cid})
+            progress_rows.append({
+                "student_id": student_id, "course_id": cid,
+                "percent_complete": (done_lessons + done_videos) / total * 100 if total else 0.0,
+                "completed_lessons": done_lessons, "completed_videos": done_videos,
+            })
+            lesson_progress_rows += [
+                {"student_id": student_id, "lesson_id": lid, "completed": True}
+                for lid in list(lesson_ids[cid])[:done_lessons]
+            ]
+            video_progress_rows += [
+                {"student_id": student_id, "video_id": vid, "completed": True}
+                for vid in list(video_ids[cid])[:done_videos]
+            ]
+
+    for model, rows in ((Enrollment, enrollment_rows), (Progress, progress_rows),
+                        (LessonProgress, lesson_progress_rows), (VideoProgress, video_progress_rows)):
+        if rows:
+            db.session.execute(db.insert(model), rows)
+    db.session.commit()
+    course_stats.rebuild()
+
+    return {
+        "students": students, "courses": courses, "lessons": len(lesson_rows),
+        "videos": len(video_rows), "enrollments": len(enrollment_rows),
+        "lesson_progress": len(lesson_progress_rows), "video_progress": len(video_progress_rows),
+    }
@@ -0,0 +1,72 @@
+"""
+Cold-start budget check for create_app().
+
+Starts a fresh interpreter --rounds times, each running create_app()
+against a scratch copy of database/edulink.db, and checks the median time
+spent in create_app() and the peak RSS against the budgets. Also fails if
+any heavy ML module (numpy, torch, sentence_transformers, ...) was imported:
+those are loaded on first use, not at startup. On failure the slowest
+imports are listed; `flask profile-startup` shows the full picture.
+
+    python benchmarks/startup_budget.py
+    python benchmarks/startup_budget.py --max-seconds 1.0 --max-rss-mib 100
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.startup_profile import REPO, measure_startup, profile_imports
+
+DATABASE = os.path.join(REPO, 'database', 'edulink.db')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=1.5, help='median create_app() time')
+    parser.add_argument('--max-rss-mib', type=float, default=120.0, help='peak RSS')
+    parser.add_argument('--top', type=int, default=15, help='imports to list on failure')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # create_app() migrates and sets WAL on its database; keep the real one untouched
+        database = os.path.join(tmp, 'edulink.db')
+        if os.path.exists(DATABASE):
+            shutil.copyfile(DATABASE, database)
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + database)
+
+        runs = [measure_startup(env=env) for _ in range(args.rounds)]
+        seconds = statistics.median(run['seconds'] for run in runs)
+        wall = statistics.median(run['wall_s'] for run in runs)
+        rss = max(run['rss_mib'] for run in runs)
+        loaded = sorted({name for run in runs for name in run['loaded']})
+
+        print(f"create_app(): median {seconds:.3f}s (process {wall:.3f}s), peak RSS {rss:.1f} MiB "
+              f"over {args.rounds} cold starts")
+        failures = []
+        if seconds > args.max_seconds:
+            failures.append(f"startup {seconds:.3f}s > {args.max_seconds}s")
+        if rss > args.max_rss_mib:
+            failures.append(f"peak RSS {rss:.1f} MiB > {args.max_rss_mib} MiB")
+        if loaded:
+            failures.append(f"heavy modules imported at startup: {', '.join(loaded)}")
+
+        if failures:
+            _, rows = profile_imports(env=env)
+            print("Slowest imports (cumulative ms):")
+            for _, cumulative_us, module, depth in sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]:
+                print(f"  {cumulative_us / 1000:8.1f}  {module}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from app import create_app, db
 from app.models import Course, Lesson, User, Video, VideoProgress, LessonProgress, Progress, Enrollment
+from app.utils import course_stats
 
 app = create_app()
 app.app_context().push()
@@ -54,4 +55,7 @@ if not Course.query.first():
     db.session.commit()
     print("Sample videos created.")
 
+# Refresh the materialized per-course counters
+course_stats.rebuild()
+
 print("Database initialization completed successfully!")
@@ -1,6 +1,7 @@
 
 from app import create_app, db
 from app.models import Course, User
+from app.utils import course_stats
 
 app = create_app()
 
@@ -33,6 +34,8 @@ def seed_courses():
                 db.session.add(course)
 
         db.session.commit()
+        # Refresh the materialized per-course counters
+        course_stats.rebuild()
         print("✅ Seeded courses for classes 1–12.")
 
 if __name__ == "__main__":
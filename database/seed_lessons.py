@@ -1,5 +1,6 @@
 from app import create_app, db
 from app.models import Lesson, Course
+from app.utils import course_stats
 
 app = create_app()
 app.app_context().push()
@@ -36,4 +37,7 @@ for course in Course.query.all():
     db.session.bulk_save_objects(lessons)
 
 db.session.commit()
+# Refresh the materialized per-course counters
+course_stats.rebuild()
+
 print("✅ Lessons inserted successfully!")
@@ -0,0 +1,44 @@
+# gunicorn -c gunicorn.conf.py run:app
+#
+# The sentence-transformer model is loaded lazily on the first request that
+# needs it. Set EDULINK_PRELOAD_MODEL to load it up front instead:
+#   EDULINK_PRELOAD_MODEL=worker  load once per worker after fork
+#   EDULINK_PRELOAD_MODEL=master  load once in the master and share it with
+#                                 forked workers (requires preload_app)
+import logging
+import os
+
+preload_model = os.environ.get("EDULINK_PRELOAD_MODEL", "")
+preload_app = preload_model == "master"
+
+
+def on_starting(server):
+    # Several workers must share recommendation-cache invalidations: the
+    # exported worker count makes the cache default to its SQLite backend
+    # (app/utils/recommendation_cache.py). With preload_app the app is
+    # already loaded here, so set RECOMMENDATION_CACHE=sqlite explicitly.
+    if server.cfg.workers > 1:
+        os.environ.setdefault("WEB_CONCURRENCY", str(server.cfg.workers))
+    if preload_model == "master":
+        from app.utils import embedding_service
+        embedding_service.preload()
+
+
+def post_fork(server, worker):
+    from app.utils.recommendation_cache import MemoryBackend, recommendation_cache
+    if server.cfg.workers > 1 and isinstance(recommendation_cache.backend, MemoryBackend):
+        logging.getLogger(__name__).warning(
+            "RECOMMENDATION_CACHE=memory with %d workers: invalidations are per worker, so "
+            "recommendations can be stale for up to the cache TTL; set RECOMMENDATION_CACHE=sqlite",
+            server.cfg.workers,
+        )
+    if preload_model == "worker":
+        from app.utils import embedding_service
+        embedding_service.preload()
+
+
+def worker_exit(server, worker):
+    # Write any buffered progress events (PROGRESS_BUFFER) before exiting
+    from app.utils.progress_buffer import progress_buffer
+    if progress_buffer.enabled:
+        progress_buffer.close()
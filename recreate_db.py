@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import create_app, db
 from app.models import Course, Lesson, User, Video, VideoProgress, LessonProgress, Progress, Enrollment
+from app.utils import course_stats
 
 def recreate_database():
     """Recreate the database with all current models"""
@@ -114,6 +115,8 @@ def recreate_database():
             db.session.commit()
             print("Sample videos added to first 6 courses.")
         
+        # Refresh the materialized per-course counters
+        course_stats.rebuild()
         print("Database initialization completed successfully!")
 
 if __name__ == "__main__":